@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк сохранения и восстановления контекстов памяти диалогов после перезапуска.
+
+Для каждого хранилища (memory, sqlite) измеряются: сохранение размеров контекстов
+всех пользователей (save_snapshot), загрузка их при запуске (restore_snapshot)
+и первое обращение пользователя после перезапуска, которое восстанавливает контекст
+из истории сообщений (get_memory). MongoDB не запускается: для нее нужен сервер.
+
+Пример:
+    python benchmarks/bench_memory_reload.py --users 100000 --history-users 1000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Настройки бота не нужны: хранилища работают без MongoDB и без Telegram
+os.environ.setdefault('ADMIN_IDS', '1')
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import operations
+from database.models import Message
+from database.storage_memory import InMemoryStorage
+from database.storage_sqlite import SQLiteStorage
+from services.vector_memory import MAX_MESSAGES, VectorMemoryService
+
+async def run(name: str, storage, users: int, history_users: int) -> None:
+    operations.storage = storage
+
+    # История сообщений для пользователей, у которых замеряется первое обращение
+    started_at = datetime.now() - timedelta(days=1)
+    for user_id in range(history_users):
+        await operations.add_messages_to_history([
+            Message(user_id=user_id, text=f"сообщение {i} пользователя {user_id} " * 4,
+                    is_user=i % 2 == 0, timestamp=started_at + timedelta(seconds=i))
+            for i in range(MAX_MESSAGES)
+        ])
+
+    # Размеры контекстов до перезапуска: все пользователи изменились с прошлого сохранения
+    service = VectorMemoryService(retrieval=False)
+    for user_id in range(users):
+        service.evicted[user_id] = MAX_MESSAGES
+        service.dirty.add(user_id)
+    started = time.perf_counter()
+    await service.save_snapshot()
+    save_s = time.perf_counter() - started
+
+    restarted = VectorMemoryService(retrieval=False)
+    started = time.perf_counter()
+    restored = await restarted.restore_snapshot()
+    restore_s = time.perf_counter() - started
+
+    loads = []
+    for user_id in range(history_users):
+        started = time.perf_counter()
+        memory = await restarted.get_memory(user_id)
+        loads.append((time.perf_counter() - started) * 1000)
+        assert len(memory) == MAX_MESSAGES
+
+    print(
+        f"{name:>7}: {users} пользователей, сохранение {save_s:.2f} с, загрузка {restore_s:.2f} с "
+        f"({restored} контекстов), первое обращение p50 {statistics.median(loads):.2f} мс"
+    )
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк восстановления памяти диалогов")
+    parser.add_argument('--users', type=int, default=100000, help="Пользователей с сохраненным контекстом")
+    parser.add_argument('--history-users', type=int, default=1000,
+                        help="Пользователей с историей для замера первого обращения")
+    args = parser.parse_args(argv)
+
+    print(f"Python {sys.version.split()[0]}")
+    asyncio.run(run('memory', InMemoryStorage(), args.users, args.history_users))
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run('sqlite', SQLiteStorage(os.path.join(directory, 'bench.db')), args.users, args.history_users))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк поиска по старым сообщениям (SemanticIndex).
+
+Индекс заполняется синтетическими сообщениями на русском (~180 символов) и измеряются:
+время добавления сообщения, задержка одного запроса (p50/p95) и запроса в пачке,
+объем индекса и сколько таких индексов помещается в бюджет VECTOR_MEMORY_MAX_BYTES.
+Качество оценивается долей запросов, для которых исходное сообщение попало в top-k:
+запрос - половина слов случайного сообщения индекса с измененными окончаниями.
+
+Пример:
+    python benchmarks/bench_semantic_index.py --size 10000 --dim 128 256
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from typing import List
+
+# Настройки бота не нужны: индекс работает без базы и без Telegram
+os.environ.setdefault('ADMIN_IDS', '1')
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from services.semantic_index import DocumentFrequencies, SemanticIndex, extract_features
+
+STEMS = (
+    "тревог страх сон работ начальник коллег мам пап сестр брат муж жен ребенк сын доч "
+    "друз подруг отношени расставани одиночеств устал выгорани деньг долг учеб экзамен "
+    "сесси переезд город здоровь болезн врач терапи таблетк паник дыхани спорт бег "
+    "отпуск мор праздник день рождени ссор обид злост вин стыд радост планы мечт цел "
+    "привычк утр вечер ночь выходн телефон соцсет новост будущ прошл детств школ"
+).split()
+ENDINGS = ("", "а", "и", "у", "е", "ой", "ами", "ах", "ом", "ы")
+FILLER = "я не знаю как быть мне кажется что это опять когда после снова очень уже".split()
+
+def make_message(rng: random.Random, chars: int = 180) -> str:
+    words: List[str] = []
+    while sum(len(word) + 1 for word in words) < chars:
+        if rng.random() < 0.4:
+            words.append(rng.choice(FILLER))
+        else:
+            words.append(rng.choice(STEMS) + rng.choice(ENDINGS))
+    return ' '.join(words)
+
+def make_query(rng: random.Random, message: str) -> str:
+    """Перефразировка: половина слов сообщения, часть - с другими окончаниями"""
+    words = [word for word in message.split() if word not in FILLER]
+    words = rng.sample(words, max(1, len(words) // 2))
+    return ' '.join(word[:-1] + rng.choice(ENDINGS) if len(word) > 4 and rng.random() < 0.5 else word
+                    for word in words)
+
+def percentile(samples: List[float], share: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+def run(dim: int, size: int, queries: int, k: int, seed: int) -> None:
+    rng = random.Random(seed)
+    messages = [make_message(rng) for _ in range(size)]
+    index = SemanticIndex(DocumentFrequencies(), dim=dim, max_size=size)
+
+    started = time.perf_counter()
+    for i, message in enumerate(messages):
+        index.add("user" if i % 2 else "assistant", message)
+    insert_ms = (time.perf_counter() - started) / size * 1000
+
+    targets = [rng.randrange(size) for _ in range(queries)]
+    texts = [make_query(rng, messages[target]) for target in targets]
+
+    latencies = []
+    found = 0
+    for target, text in zip(targets, texts):
+        started = time.perf_counter()
+        result = index.search([text], k)[0]
+        latencies.append((time.perf_counter() - started) * 1000)
+        found += any(position == target for _, position in result)
+
+    batch = 20
+    started = time.perf_counter()
+    for start in range(0, queries, batch):
+        index.search(texts[start:start + batch], k)
+    batch_ms = (time.perf_counter() - started) / queries * 1000
+
+    started = time.perf_counter()
+    for text in texts:
+        extract_features(text)
+    features_ms = (time.perf_counter() - started) / queries * 1000
+
+    megabytes = index.nbytes / 1024 / 1024
+    print(
+        f"dim={dim:<4} size={size:<6} добавление {insert_ms:.3f} мс, "
+        f"запрос p50 {statistics.median(latencies):.3f} мс / p95 {percentile(latencies, 0.95):.3f} мс "
+        f"(признаки {features_ms:.3f} мс), в пачке по {batch} {batch_ms:.3f} мс, "
+        f"recall@{k} {found / queries:.2f}, индекс {megabytes:.1f} МБ, "
+        f"в бюджет {config.VECTOR_MEMORY_MAX_BYTES / 1024 / 1024:.0f} МБ: {int(config.VECTOR_MEMORY_MAX_BYTES // index.nbytes)}"
+    )
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк SemanticIndex")
+    parser.add_argument('--size', type=int, nargs='+', default=[1000, config.VECTOR_MEMORY_INDEX_SIZE, 10000],
+                        help="Сообщений в индексе")
+    parser.add_argument('--dim', type=int, nargs='+', default=[config.VECTOR_MEMORY_DIM], help="Размерность векторов")
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--k', type=int, default=config.VECTOR_MEMORY_TOP_K)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    print(f"Python {sys.version.split()[0]}")
+    for dim in args.dim:
+        for size in dict.fromkeys(args.size):
+            run(dim, size, args.queries, args.k, args.seed)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк контекста диалога в VectorMemoryService.
+
+Сравнивает прежнее хранение (список словарей {role, content}, обрезаемый срезом
+[-MAX_MESSAGES:] после каждого сообщения) с текущим (deque(maxlen=MAX_MESSAGES)
+из MemoryEntry). Измеряются время добавления сообщения в заполненный контекст
+(perf_counter), пиковое выделение памяти на одно добавление и память, занимаемая
+контекстом одного пользователя без текстов сообщений (tracemalloc).
+
+Пример:
+    python benchmarks/bench_vector_memory.py --users 2000 --message-chars 200
+"""
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from collections import deque
+from typing import Callable, Dict, List
+
+# Настройки бота не нужны: память работает без базы и без Telegram
+os.environ.setdefault('ADMIN_IDS', '1')
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.vector_memory import MAX_MESSAGES, MemoryEntry, VectorMemoryService
+
+def legacy_add(memory: List[Dict[str, str]], role: str, content: str) -> None:
+    """Добавление сообщения в прежнем формате"""
+    memory.append({"role": role, "content": content})
+    if len(memory) > MAX_MESSAGES:
+        memory[:] = memory[-MAX_MESSAGES:]
+
+def current_add(memory: deque, role: str, content: str) -> None:
+    """Добавление сообщения в текущем формате"""
+    memory.append(MemoryEntry(role, content))
+
+def time_add(add: Callable, memory, texts: List[str], rounds: int) -> float:
+    """Среднее время добавления в заполненный контекст, микросекунды"""
+    started = time.perf_counter()
+    for i in range(rounds):
+        add(memory, "user" if i % 2 else "assistant", texts[i % len(texts)])
+    return (time.perf_counter() - started) / rounds * 1e6
+
+def peak_per_add(add: Callable, memory, texts: List[str], rounds: int) -> float:
+    """Пиковое выделение памяти на одно добавление, байты"""
+    tracemalloc.start()
+    peaks = 0
+    for i in range(rounds):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        add(memory, "user", texts[i % len(texts)])
+        peaks += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return peaks / rounds
+
+def resident_per_user(make: Callable, add: Callable, texts: List[str], users: int) -> float:
+    """Память заполненного контекста одного пользователя без текстов (тексты общие), байты"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    memories = []
+    for _ in range(users):
+        memory = make()
+        for i in range(MAX_MESSAGES):
+            add(memory, "user" if i % 2 else "assistant", texts[i % len(texts)])
+        memories.append(memory)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / users
+
+async def time_service(texts: List[str], users: int, rounds: int) -> float:
+    """Среднее время VectorMemoryService.add_message с учетом LRU и бюджета, микросекунды"""
+    service = VectorMemoryService(retrieval=False)
+    for user_id in range(users):
+        for i in range(MAX_MESSAGES):
+            await service.add_message(user_id, "user", texts[i % len(texts)])
+    started = time.perf_counter()
+    for i in range(rounds):
+        await service.add_message(i % users, "user", texts[i % len(texts)])
+    return (time.perf_counter() - started) / rounds * 1e6
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк контекста диалога VectorMemoryService")
+    parser.add_argument('--users', type=int, default=2000, help="Пользователей для замера памяти")
+    parser.add_argument('--rounds', type=int, default=200000, help="Добавлений для замера времени")
+    parser.add_argument('--message-chars', type=int, default=200, help="Длина сообщения")
+    args = parser.parse_args(argv)
+
+    texts = [f"{i:04d} " + "слово " * (args.message_chars // 6) for i in range(64)]
+    variants = {
+        'list[dict]': (list, legacy_add),
+        'deque[MemoryEntry]': (lambda: deque(maxlen=MAX_MESSAGES), current_add),
+    }
+
+    print(f"Python {sys.version.split()[0]}, сообщение {len(texts[0])} символов, контекст {MAX_MESSAGES} сообщений")
+    for name, (make, add) in variants.items():
+        memory = make()
+        for i in range(MAX_MESSAGES):
+            add(memory, "user", texts[i])
+        add_us = time_add(add, memory, texts, args.rounds)
+        peak = peak_per_add(add, memory, texts, min(args.rounds, 20000))
+        resident = resident_per_user(make, add, texts, args.users)
+        print(f"{name:>20}: добавление {add_us:.2f} мкс, пик {peak:.0f} Б на добавление, "
+              f"контекст {resident:.0f} Б на пользователя")
+
+    service_us = asyncio.run(time_service(texts, min(args.users, 500), min(args.rounds, 50000)))
+    print(f"VectorMemoryService.add_message: {service_us:.2f} мкс")
+
+if __name__ == '__main__':
+    main()
@@ -16,13 +16,97 @@ ADMIN_IDS = list(map(int, os.getenv('ADMIN_IDS', '').split(',')))
 # Формат: 123456789:TEST:XXXXXXXXXX
 TELEGRAM_PROVIDER_TOKEN = os.getenv('TELEGRAM_PROVIDER_TOKEN', '381764678:TEST:121476').strip()
 
+# Хранилище данных: mongo, memory или sqlite
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'mongo')
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'data/bot.sqlite3')
+
 # MongoDB
 MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
 DB_NAME = os.getenv('DB_NAME', 'psycholog_bot')
 
+# Кэш пользователей (0 - отключить)
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '10000'))
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', '30'))
+
+# Агрегация метрик для графиков админ-панели
+METRICS_ROLLUP_INTERVAL = float(os.getenv('METRICS_ROLLUP_INTERVAL', '300'))  # Период запуска, секунды
+METRICS_BACKFILL_DAYS = int(os.getenv('METRICS_BACKFILL_DAYS', '30'))  # Глубина первой агрегации
+
 # AI Agent
 AI_AGENT_URL = os.getenv('AI_AGENT_URL', 'https://api.bilalov.ai/api/message')
 AI_AGENT_ID = os.getenv('AI_AGENT_ID', 'ed3ca89f25ba41b1a5c6')
+# Несколько адресов агента через запятую в формате url|agent_id (agent_id можно не указывать).
+# Если не задано, используется только AI_AGENT_URL
+AI_AGENT_ENDPOINTS = [
+    (endpoint.split('|')[0].strip(), endpoint.split('|')[1].strip() if '|' in endpoint else AI_AGENT_ID)
+    for endpoint in os.getenv('AI_AGENT_ENDPOINTS', '').split(',')
+    if endpoint.strip()
+]
+AI_LATENCY_EWMA_ALPHA = float(os.getenv('AI_LATENCY_EWMA_ALPHA', '0.3'))  # Вес нового замера задержки адреса
+
+# Пул HTTP-соединений к AI агенту
+AI_HTTP_POOL_SIZE = int(os.getenv('AI_HTTP_POOL_SIZE', '100'))  # Максимум одновременных соединений
+AI_HTTP_KEEPALIVE = float(os.getenv('AI_HTTP_KEEPALIVE', '60'))  # Время жизни простаивающего соединения, секунды
+AI_HTTP_DNS_TTL = int(os.getenv('AI_HTTP_DNS_TTL', '300'))  # Время кэширования DNS, секунды
+AI_HTTP_PREWARM = int(os.getenv('AI_HTTP_PREWARM', '0'))  # Сколько соединений открыть при запуске
+
+# Таймауты, повторы и предохранитель запросов к AI агенту
+AI_CONNECT_TIMEOUT = float(os.getenv('AI_CONNECT_TIMEOUT', '5'))  # Установка соединения, секунды
+AI_READ_TIMEOUT = float(os.getenv('AI_READ_TIMEOUT', '60'))  # Максимальная пауза между порциями ответа, секунды
+AI_MAX_RETRIES = int(os.getenv('AI_MAX_RETRIES', '2'))  # Повторы после первой попытки
+AI_RETRY_BASE_DELAY = float(os.getenv('AI_RETRY_BASE_DELAY', '0.5'))  # Базовая задержка экспоненциального повтора
+AI_RETRY_MAX_DELAY = float(os.getenv('AI_RETRY_MAX_DELAY', '5'))  # Максимальная задержка повтора
+AI_BREAKER_FAILURE_THRESHOLD = int(os.getenv('AI_BREAKER_FAILURE_THRESHOLD', '5'))  # Неудачных запросов подряд до размыкания
+AI_BREAKER_RESET_TIMEOUT = float(os.getenv('AI_BREAKER_RESET_TIMEOUT', '30'))  # Через сколько секунд пробовать снова
+
+# Хеджирование: дублирующий запрос на другой адрес, если ответа нет дольше текущего p95 задержки.
+# Агент с памятью диалога получил бы реплику пользователя дважды, поэтому запросы с user_id
+# дублируются, только если API отбрасывает повторы с тем же request_id (AI_AGENT_DEDUPLICATES)
+AI_HEDGING = os.getenv('AI_HEDGING', 'false').lower() == 'true'
+AI_HEDGE_BUDGET = float(os.getenv('AI_HEDGE_BUDGET', '0.05'))  # Максимальная доля дублированных запросов
+AI_HEDGE_BUDGET_BURST = float(os.getenv('AI_HEDGE_BUDGET_BURST', '10'))  # Сколько дублей можно накопить про запас
+AI_HEDGE_MIN_DELAY = float(os.getenv('AI_HEDGE_MIN_DELAY', '0.5'))  # Минимальное ожидание перед дублем, секунды
+AI_HEDGE_MIN_SAMPLES = int(os.getenv('AI_HEDGE_MIN_SAMPLES', '50'))  # Замеров задержки до включения хеджирования
+AI_AGENT_DEDUPLICATES = os.getenv('AI_AGENT_DEDUPLICATES', 'false').lower() == 'true'  # API отбрасывает повторы по request_id
+
+# Кэш ответов на первые сообщения пользователей без истории, ключ - нормализованный текст и agent_id.
+# Ответ из кэша API агента не видит: его память о пользователе начинается со второго сообщения
+AI_RESPONSE_CACHE = os.getenv('AI_RESPONSE_CACHE', 'false').lower() == 'true'
+AI_RESPONSE_CACHE_MAX_BYTES = int(os.getenv('AI_RESPONSE_CACHE_MAX_BYTES', str(8 * 1024 * 1024)))  # Объем кэша, байты
+AI_RESPONSE_CACHE_TTL = float(os.getenv('AI_RESPONSE_CACHE_TTL', '3600'))  # Время жизни ответа, секунды
+AI_RESPONSE_CACHE_MAX_PROMPT = int(os.getenv('AI_RESPONSE_CACHE_MAX_PROMPT', '100'))  # Длиннее не кэшируются, символы
+
+# Локальная память диалогов: общий бюджет на всех пользователей, при превышении
+# вытесняются давно не писавшие пользователи (их контекст потом загружается из истории в базе)
+VECTOR_MEMORY_MAX_BYTES = int(os.getenv('VECTOR_MEMORY_MAX_BYTES', str(64 * 1024 * 1024)))  # Байты
+VECTOR_MEMORY_MAX_MESSAGES = int(os.getenv('VECTOR_MEMORY_MAX_MESSAGES', '200000'))  # Сообщений всех пользователей
+VECTOR_MEMORY_SNAPSHOT_INTERVAL = float(os.getenv('VECTOR_MEMORY_SNAPSHOT_INTERVAL', '10'))  # Сохранение для перезапуска, секунды (0 - не сохранять)
+# Поиск по старым сообщениям пользователя (нужен NumPy): найденные сообщения передаются агенту
+VECTOR_MEMORY_RETRIEVAL = os.getenv('VECTOR_MEMORY_RETRIEVAL', 'false').lower() == 'true'
+VECTOR_MEMORY_TOP_K = int(os.getenv('VECTOR_MEMORY_TOP_K', '3'))  # Сколько сообщений передавать
+VECTOR_MEMORY_MIN_SCORE = float(os.getenv('VECTOR_MEMORY_MIN_SCORE', '0.15'))  # Минимальная косинусная близость
+VECTOR_MEMORY_INDEX_SIZE = int(os.getenv('VECTOR_MEMORY_INDEX_SIZE', '2000'))  # Сообщений в индексе пользователя (~2.9 МБ при размерности 256)
+VECTOR_MEMORY_DIM = int(os.getenv('VECTOR_MEMORY_DIM', '256'))  # Размерность векторов
+
+# Планировщик запросов к AI агенту
+AI_MAX_CONCURRENCY = int(os.getenv('AI_MAX_CONCURRENCY', '20'))  # Одновременных запросов к агенту
+AI_QUEUE_SIZE = int(os.getenv('AI_QUEUE_SIZE', '200'))  # Максимум запросов в очереди ожидания
+# Веса классов приоритета: доля освободившихся слотов, которую получает каждый класс
+AI_PRIORITY_WEIGHTS = {
+    name: int(weight)
+    for name, weight in (
+        item.split(':') for item in os.getenv('AI_PRIORITY_WEIGHTS', 'unlimited:4,paid:2,free:1').split(',')
+    )
+}
+
+# Объединение быстрых серий сообщений пользователя в один запрос (0 - отключено)
+MESSAGE_DEBOUNCE_MS = int(os.getenv('MESSAGE_DEBOUNCE_MS', '0'))  # Пауза, после которой серия считается законченной
+MESSAGE_DEBOUNCE_MAX_MS = int(os.getenv('MESSAGE_DEBOUNCE_MAX_MS', '5000'))  # Максимальное ожидание с первого сообщения серии
+
+# Потоковая передача ответов AI агента в Telegram (включать, только если API агента поддерживает stream)
+AI_STREAMING = os.getenv('AI_STREAMING', 'false').lower() == 'true'
+AI_STREAM_EDIT_INTERVAL = float(os.getenv('AI_STREAM_EDIT_INTERVAL', '1.0'))  # Минимум секунд между правками сообщения
+AI_STREAM_MIN_CHARS = int(os.getenv('AI_STREAM_MIN_CHARS', '20'))  # Минимум новых символов для очередной правки
 
 # Токены
 FREE_TOKENS = 50  # Количество бесплатных токенов за подписку
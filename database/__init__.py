@@ -1,6 +1,7 @@
-from database.models import User, Payment, Review
+from database.models import User, UserSummary, Message, Payment, Review
 from database.operations import (
     get_user,
+    get_user_summary,
     get_or_create_user,
     create_user,
     update_user,
@@ -9,6 +10,11 @@ from database.operations import (
     set_subscription_status,
     set_unlimited_status,
     add_message_to_history,
+    add_messages_to_history,
+    get_chat_history,
+    record_exchange,
+    save_memory_contexts,
+    load_memory_contexts,
     create_payment,
     get_payment,
     update_payment_status,
@@ -18,15 +24,21 @@ from database.operations import (
     get_all_reviews,
     generate_referral_code,
     get_user_by_referral_code,
-    process_referral
+    process_referral,
+    ensure_indexes
 )
 from database.statistics import get_bot_statistics
+from database.metrics import run_metrics_rollup, metrics_rollup_loop, get_metrics_series
+from database.cache import user_cache
 
 __all__ = [
     'User',
+    'UserSummary',
+    'Message',
     'Payment',
     'Review',
     'get_user',
+    'get_user_summary',
     'get_or_create_user',
     'create_user',
     'update_user',
@@ -35,6 +47,11 @@ __all__ = [
     'set_subscription_status',
     'set_unlimited_status',
     'add_message_to_history',
+    'add_messages_to_history',
+    'get_chat_history',
+    'record_exchange',
+    'save_memory_contexts',
+    'load_memory_contexts',
     'create_payment',
     'get_payment',
     'update_payment_status',
@@ -45,5 +62,10 @@ __all__ = [
     'generate_referral_code',
     'get_user_by_referral_code',
     'process_referral',
-    'get_bot_statistics'
+    'get_bot_statistics',
+    'run_metrics_rollup',
+    'metrics_rollup_loop',
+    'get_metrics_series',
+    'ensure_indexes',
+    'user_cache'
 ] 
\ No newline at end of file
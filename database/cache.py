@@ -0,0 +1,118 @@
+import copy
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+class UserCache:
+    """
+    Ограниченный по размеру кэш документов пользователей с TTL и LRU-вытеснением.
+
+    Методы синхронные и не содержат await, поэтому внутри одного event loop
+    каждая операция выполняется атомарно и блокировки не нужны.
+    Кэш хранит как полные документы, так и частичные (загруженные через проекцию).
+    """
+
+    def __init__(self, max_size: int = config.USER_CACHE_SIZE, ttl: float = config.USER_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        logger.info(f"Инициализирован кэш пользователей: max_size={max_size}, ttl={ttl}s")
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl > 0
+
+    def get(self, user_id: int, require_full: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Получить копию документа пользователя из кэша
+
+        Args:
+            user_id: ID пользователя
+            require_full: Требуется ли полный документ (а не результат проекции)
+
+        Returns:
+            Dict: Копия документа или None при промахе
+        """
+        entry = self._entries.get(user_id)
+        if entry is None or entry['expires_at'] < time.monotonic():
+            if entry is not None:
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+        if require_full and not entry['full']:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return copy.deepcopy(entry['data'])
+
+    def set(self, user_id: int, data: Dict[str, Any], full: bool = True) -> None:
+        """Положить документ пользователя в кэш"""
+        if not self.enabled:
+            return
+
+        existing = self._entries.get(user_id)
+        if not full and existing is not None and existing['full']:
+            # Не заменяем полный документ частичным, а лишь обновляем пересекающиеся поля
+            existing['data'].update(copy.deepcopy(data))
+            self._entries.move_to_end(user_id)
+            return
+
+        self._entries[user_id] = {
+            'data': copy.deepcopy(data),
+            'full': full,
+            'expires_at': time.monotonic() + self.ttl
+        }
+        self._entries.move_to_end(user_id)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def apply_update(self, user_id: int, update: Dict[str, Dict[str, Any]]) -> None:
+        """Применить к закэшированному документу тот же $set/$inc, что ушел в базу"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return
+
+        data = entry['data']
+        for name, value in update.get('$set', {}).items():
+            data[name] = copy.deepcopy(value)
+        for name, delta in update.get('$inc', {}).items():
+            if name not in data:
+                # Без исходного значения результат $inc неизвестен
+                self.invalidate(user_id)
+                return
+            data[name] = (data[name] or 0) + delta
+
+    def invalidate(self, user_id: int) -> None:
+        """Удалить пользователя из кэша"""
+        self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        """Очистить кэш"""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Размер кэша и статистика попаданий"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+# Создаем экземпляр кэша
+user_cache = UserCache()
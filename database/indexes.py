@@ -0,0 +1,101 @@
+import logging
+from typing import Dict, List
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Ожидаемые индексы для каждой коллекции
+EXPECTED_INDEXES: Dict[str, List[IndexModel]] = {
+    'users': [
+        IndexModel([('user_id', ASCENDING)], name='user_id_unique', unique=True),
+        # Реферальный код есть не у всех пользователей, поэтому индекс частичный
+        IndexModel(
+            [('referral_code', ASCENDING)],
+            name='referral_code_unique',
+            unique=True,
+            partialFilterExpression={'referral_code': {'$type': 'string'}}
+        ),
+        IndexModel([('created_at', ASCENDING)], name='created_at'),
+    ],
+    'payments': [
+        IndexModel([('payment_id', ASCENDING)], name='payment_id_unique', unique=True),
+        IndexModel([('status', ASCENDING), ('completed_at', ASCENDING)], name='status_completed_at'),
+        IndexModel([('user_id', ASCENDING)], name='user_id'),
+    ],
+    'reviews': [
+        IndexModel([('user_id', ASCENDING), ('created_at', ASCENDING)], name='user_id_created_at'),
+    ],
+    'messages': [
+        IndexModel([('user_id', ASCENDING), ('timestamp', ASCENDING)], name='user_id_timestamp'),
+        IndexModel([('timestamp', ASCENDING)], name='timestamp'),
+    ],
+    'metrics': [
+        IndexModel([('granularity', ASCENDING), ('start', ASCENDING)], name='granularity_start_unique', unique=True),
+    ],
+    'memory_contexts': [
+        IndexModel([('user_id', ASCENDING)], name='user_id_unique', unique=True),
+        IndexModel([('updated_at', ASCENDING)], name='updated_at'),
+    ],
+}
+
+def _key_pattern(key) -> tuple:
+    """Ключ индекса в виде, сравнимом между IndexModel и index_information()"""
+    items = key.items() if hasattr(key, 'items') else key
+    return tuple((field, direction) for field, direction in items)
+
+async def ensure_collection_indexes(db, collection_name: str) -> List[str]:
+    """
+    Создает недостающие индексы одной коллекции из EXPECTED_INDEXES.
+
+    Индекс с тем же ключом, но другим именем (например, созданный раньше
+    с именем по умолчанию) считается существующим: MongoDB не позволяет
+    создать второй индекс с тем же ключом и вернула бы IndexOptionsConflict.
+
+    Returns:
+        List[str]: Имена индексов, которые так и не удалось создать
+    """
+    collection = db[collection_name]
+    indexes = EXPECTED_INDEXES[collection_name]
+
+    existing_keys = {_key_pattern(info['key']) for info in (await collection.index_information()).values()}
+    to_create = [index for index in indexes if _key_pattern(index.document['key']) not in existing_keys]
+
+    if to_create:
+        try:
+            await collection.create_indexes(to_create)
+        except OperationFailure as e:
+            # Например, дубликаты user_id не дают построить уникальный индекс
+            logger.error(f"Ошибка при создании индексов коллекции {collection_name}: {str(e)}")
+
+    existing_keys = {_key_pattern(info['key']) for info in (await collection.index_information()).values()}
+    return [
+        index.document['name']
+        for index in indexes
+        if _key_pattern(index.document['key']) not in existing_keys
+    ]
+
+async def ensure_indexes(db) -> Dict[str, List[str]]:
+    """
+    Создает недостающие индексы во всех коллекциях.
+    Операция идемпотентна и вызывается при старте бота.
+
+    Args:
+        db: База данных motor
+
+    Returns:
+        Dict[str, List[str]]: Индексы, которые так и не удалось создать, по коллекциям
+    """
+    missing: Dict[str, List[str]] = {}
+
+    for collection_name in EXPECTED_INDEXES:
+        missing_names = await ensure_collection_indexes(db, collection_name)
+
+        if missing_names:
+            missing[collection_name] = missing_names
+            logger.warning(f"В коллекции {collection_name} отсутствуют индексы: {', '.join(missing_names)}")
+        else:
+            logger.info(f"Индексы коллекции {collection_name} в порядке")
+
+    return missing
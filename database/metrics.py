@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import config
+from database.storage import storage, empty_metrics_bucket
+
+logger = logging.getLogger(__name__)
+
+def _hour_start(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+def _day_start(moment: datetime) -> datetime:
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _merge_bucket(target: Dict[str, Any], source: Dict[str, Any]) -> None:
+    """Прибавить значения бакета source к target"""
+    target['new_users'] += source.get('new_users', 0)
+    target['messages'] += source.get('messages', 0)
+    for field in ('payments', 'revenue'):
+        for tariff, value in source.get(field, {}).items():
+            target[field][tariff] = target[field].get(tariff, 0) + value
+
+async def run_metrics_rollup(now: Optional[datetime] = None) -> int:
+    """
+    Инкрементально обновить почасовые и дневные бакеты метрик.
+
+    Пересчитываются только часы начиная с сохраненной отметки (обычно текущий час),
+    дневные бакеты затронутых дней собираются из почасовых.
+    При первом запуске агрегируются последние METRICS_BACKFILL_DAYS дней.
+
+    Returns:
+        int: Количество обновленных почасовых бакетов
+    """
+    now = now or datetime.now()
+    current_hour = _hour_start(now)
+
+    watermark = await storage.get_metrics_watermark()
+    if watermark is None:
+        watermark = _day_start(now) - timedelta(days=config.METRICS_BACKFILL_DAYS)
+
+    hourly = await storage.compute_hourly_metrics(watermark, now)
+    await storage.save_metrics(hourly)
+
+    # Дневные бакеты всех затронутых дней собираются из почасовых
+    daily: Dict[datetime, Dict[str, Any]] = {}
+    for bucket in await storage.find_metrics('hour', _day_start(watermark)):
+        day = _day_start(bucket['start'])
+        if day not in daily:
+            daily[day] = empty_metrics_bucket('day', day)
+        _merge_bucket(daily[day], bucket)
+
+    # Текущий час еще не закончился, поэтому следующий запуск начнется с него
+    await storage.save_metrics([daily[day] for day in sorted(daily)], watermark=current_hour)
+
+    logger.debug(f"Агрегация метрик: {len(hourly)} часов, {len(daily)} дней с {watermark}")
+    return len(hourly)
+
+async def metrics_rollup_loop(interval: float = config.METRICS_ROLLUP_INTERVAL) -> None:
+    """Периодически запускать агрегацию метрик (фоновая задача бота)"""
+    while True:
+        try:
+            await run_metrics_rollup()
+        except Exception as e:
+            logger.error(f"Ошибка при агрегации метрик: {str(e)}")
+        await asyncio.sleep(interval)
+
+async def get_metrics_series(granularity: str, periods: int, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """
+    Получить ряд бакетов за последние periods часов или дней, включая текущий.
+    Периоды без активности заполняются нулевыми бакетами.
+
+    Args:
+        granularity: hour или day
+        periods: Количество периодов
+    """
+    now = now or datetime.now()
+    step = timedelta(hours=1) if granularity == 'hour' else timedelta(days=1)
+    last = _hour_start(now) if granularity == 'hour' else _day_start(now)
+    first = last - step * (periods - 1)
+
+    stored = {bucket['start']: bucket for bucket in await storage.find_metrics(granularity, first)}
+    return [
+        stored.get(first + step * index) or empty_metrics_bucket(granularity, first + step * index)
+        for index in range(periods)
+    ]
@@ -1,9 +1,21 @@
 #!/usr/bin/env python3
+import argparse
 import asyncio
 import logging
 import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 
-from database.operations import users_collection
+from pymongo import ASCENDING, ReplaceOne, UpdateOne
+
+import config
+from database.indexes import ensure_collection_indexes
+from database.storage_mongo import MongoStorage
+
+# Миграции работают напрямую с коллекциями MongoDB
+mongo_storage = MongoStorage(config.MONGO_URI, config.DB_NAME)
+db = mongo_storage.db
 
 # Настройка логирования
 logging.basicConfig(
@@ -13,39 +25,275 @@ logging.basicConfig(
 )
 logger = logging.getLogger('migration')
 
-async def add_subscription_bonus_field():
+class Migration:
+    """
+    Базовый класс миграции.
+
+    Миграция перебирает документы коллекции collection_name, подходящие под query,
+    в порядке _id и обрабатывает их пачками. По умолчанию для каждого документа
+    строятся операции build_requests, которые отправляются одним bulk_write на пачку.
+    """
+
+    name: str = ''
+    description: str = ''
+    # Если коллекция не указана, миграция выполняется один раз через run_once
+    collection_name: str = ''
+    query: Dict[str, Any] = {}
+    projection: Optional[Dict[str, Any]] = None
+
+    async def run_once(self, db) -> None:
+        """Миграция, не требующая перебора документов"""
+        raise NotImplementedError
+
+    async def setup(self, db) -> None:
+        """Подготовка перед первой пачкой (например, создание индексов)"""
+
+    def build_requests(self, document: Dict[str, Any]) -> List[Any]:
+        """Операции bulk_write для одного документа"""
+        raise NotImplementedError
+
+    async def process_batch(self, db, documents: List[Dict[str, Any]]) -> None:
+        """Обработать пачку документов"""
+        requests = []
+        for document in documents:
+            requests.extend(self.build_requests(document))
+        if requests:
+            await db[self.collection_name].bulk_write(requests, ordered=False)
+
+class AddSubscriptionBonusField(Migration):
     """
     Добавляет поле has_received_subscription_bonus всем пользователям в базе данных.
     Для уже подписанных пользователей устанавливает значение True, для остальных - False.
     """
-    logger.info("Начинаем миграцию: добавление поля has_received_subscription_bonus")
-    
-    # Количество обработанных пользователей
-    updated_count = 0
-    
-    # Получаем всех пользователей
-    cursor = users_collection.find({})
-    
-    async for user in cursor:
-        user_id = user.get('user_id')
-        is_subscribed = user.get('is_subscribed', False)
-        
-        # Устанавливаем значение поля на основе статуса подписки
-        await users_collection.update_one(
-            {'user_id': user_id},
-            {'$set': {'has_received_subscription_bonus': is_subscribed}}
+
+    name = '0001_add_subscription_bonus_field'
+    description = 'добавление поля has_received_subscription_bonus'
+    collection_name = 'users'
+    # Пользователей, у которых поле уже есть, не трогаем, чтобы не сбросить полученный бонус
+    query = {'has_received_subscription_bonus': {'$exists': False}}
+    projection = {'_id': 1, 'is_subscribed': 1}
+
+    def build_requests(self, document: Dict[str, Any]) -> List[Any]:
+        return [UpdateOne(
+            {'_id': document['_id']},
+            {'$set': {'has_received_subscription_bonus': document.get('is_subscribed', False)}}
+        )]
+
+class MoveChatHistoryToMessages(Migration):
+    """
+    Переносит массивы chat_history из документов пользователей в коллекцию messages.
+    Сообщения пачки записываются одним bulk_write, после чего у этих
+    пользователей удаляется поле chat_history.
+
+    Сообщения записываются через upsert по всем полям сообщения, поэтому
+    повтор пачки после сбоя между записью и удалением chat_history
+    (отметка о выполнении ставится только после пачки) не создает дублей.
+    """
+
+    name = '0002_move_chat_history_to_messages'
+    description = 'перенос chat_history в коллекцию messages'
+    collection_name = 'users'
+    query = {'chat_history': {'$exists': True}}
+    projection = {'_id': 1, 'user_id': 1, 'chat_history': 1}
+
+    async def setup(self, db) -> None:
+        # Те же индексы, что создает бот при запуске, иначе имена разойдутся
+        await ensure_collection_indexes(db, 'messages')
+
+    async def process_batch(self, db, documents: List[Dict[str, Any]]) -> None:
+        messages = []
+        for document in documents:
+            user_id = document.get('user_id')
+            for message in document.get('chat_history') or []:
+                messages.append({
+                    'user_id': user_id,
+                    'text': message.get('text'),
+                    'is_user': message.get('is_user', True),
+                    'timestamp': message.get('timestamp')
+                })
+
+        if messages:
+            # Фильтр попадает в индекс user_id_timestamp
+            await db['messages'].bulk_write(
+                [ReplaceOne(message, message, upsert=True) for message in messages],
+                ordered=False
+            )
+        await db['users'].update_many(
+            {'_id': {'$in': [document['_id'] for document in documents]}},
+            {'$unset': {'chat_history': ''}}
+        )
+
+class InitGlobalCounters(Migration):
+    """
+    Заполняет документ глобальных счетчиков по уже накопленным данным.
+    Запускается один раз перед переходом статистики на счетчики.
+    """
+
+    name = '0003_init_global_counters'
+    description = 'заполнение глобальных счетчиков статистики'
+
+    async def run_once(self, db) -> None:
+        total_users = await db['users'].count_documents({})
+        total_messages = await db['messages'].count_documents({})
+        pipeline = [
+            {"$match": {"status": "succeeded"}},
+            {"$group": {"_id": None, "count": {"$sum": 1}, "amount": {"$sum": "$amount"}}}
+        ]
+        payments_result = await db['payments'].aggregate(pipeline).to_list(length=1)
+        payments = payments_result[0] if payments_result else {}
+
+        await db['counters'].update_one(
+            {'_id': 'global'},
+            {'$set': {
+                'users': total_users,
+                'messages': total_messages,
+                'payments': payments.get('count', 0),
+                'revenue': payments.get('amount', 0)
+            }},
+            upsert=True
+        )
+        logger.info(
+            f"Счетчики: users={total_users}, messages={total_messages}, "
+            f"payments={payments.get('count', 0)}, revenue={payments.get('amount', 0)}"
         )
-        
-        updated_count += 1
-        if updated_count % 100 == 0:
-            logger.info(f"Обработано {updated_count} пользователей")
-    
-    logger.info(f"Миграция завершена. Всего обновлено {updated_count} пользователей.")
-
-async def main():
+
+class SetPaidTariff(Migration):
+    """
+    Заполняет поле paid_tariff у пользователей по их успешным платежам.
+    Платежи перебираются в порядке _id, поэтому у пользователя остается тариф последнего платежа.
+    """
+
+    name = '0004_set_paid_tariff'
+    description = 'заполнение paid_tariff по успешным платежам'
+    collection_name = 'payments'
+    query = {'status': 'succeeded'}
+    projection = {'_id': 1, 'user_id': 1, 'tariff': 1}
+
+    async def process_batch(self, db, documents: List[Dict[str, Any]]) -> None:
+        requests = [
+            UpdateOne({'user_id': document['user_id']}, {'$set': {'paid_tariff': document['tariff']}})
+            for document in documents
+            if document.get('tariff')
+        ]
+        if requests:
+            await db['users'].bulk_write(requests, ordered=True)
+
+# Все миграции в порядке применения. Новые миграции добавляются в конец списка.
+MIGRATIONS: List[Migration] = [
+    AddSubscriptionBonusField(),
+    MoveChatHistoryToMessages(),
+    InitGlobalCounters(),
+    SetPaidTariff(),
+]
+
+class MigrationRunner:
+    """
+    Запускает миграции пачками и записывает прогресс в коллекцию migrations.
+
+    После каждой пачки сохраняется _id последнего обработанного документа,
+    поэтому прерванная миграция продолжается с того же места.
+    Примененные миграции повторно не запускаются.
+    """
+
+    def __init__(self, db, batch_size: int = 1000):
+        self.db = db
+        self.batch_size = batch_size
+        self.migrations_collection = db['migrations']
+
+    async def run(self, migrations: List[Migration]) -> None:
+        for migration in migrations:
+            await self.apply(migration)
+
+    async def apply(self, migration: Migration) -> None:
+        state = await self.migrations_collection.find_one({'name': migration.name}) or {}
+        if state.get('status') == 'applied':
+            logger.info(f"Миграция {migration.name} уже применена, пропускаем")
+            return
+
+        last_id = state.get('last_id')
+        processed = state.get('processed', 0)
+        if last_id is not None:
+            logger.info(f"Продолжаем миграцию {migration.name} после _id={last_id} ({processed} уже обработано)")
+        else:
+            logger.info(f"Начинаем миграцию {migration.name}: {migration.description}")
+
+        await self.migrations_collection.update_one(
+            {'name': migration.name},
+            {
+                '$set': {'status': 'running', 'description': migration.description},
+                '$setOnInsert': {'started_at': datetime.now(), 'processed': 0}
+            },
+            upsert=True
+        )
+        if not migration.collection_name:
+            await migration.run_once(self.db)
+            await self.migrations_collection.update_one(
+                {'name': migration.name},
+                {'$set': {'status': 'applied', 'applied_at': datetime.now()}}
+            )
+            logger.info(f"Миграция {migration.name} завершена")
+            return
+
+        await migration.setup(self.db)
+
+        query = dict(migration.query)
+        if last_id is not None:
+            query['_id'] = {'$gt': last_id}
+
+        cursor = self.db[migration.collection_name].find(
+            query,
+            migration.projection,
+            batch_size=self.batch_size
+        ).sort('_id', ASCENDING)
+
+        started = time.monotonic()
+        processed_now = 0
+        batch = []
+
+        async for document in cursor:
+            batch.append(document)
+            if len(batch) >= self.batch_size:
+                processed_now += await self._process_batch(migration, batch)
+                self._report(migration, processed + processed_now, processed_now, started)
+                batch = []
+
+        if batch:
+            processed_now += await self._process_batch(migration, batch)
+
+        await self.migrations_collection.update_one(
+            {'name': migration.name},
+            {'$set': {'status': 'applied', 'applied_at': datetime.now()}}
+        )
+        self._report(migration, processed + processed_now, processed_now, started)
+        logger.info(f"Миграция {migration.name} завершена")
+
+    async def _process_batch(self, migration: Migration, batch: List[Dict[str, Any]]) -> int:
+        await migration.process_batch(self.db, batch)
+        # Сохраняем контрольную точку только после успешной записи пачки
+        await self.migrations_collection.update_one(
+            {'name': migration.name},
+            {
+                '$set': {'last_id': batch[-1]['_id'], 'updated_at': datetime.now()},
+                '$inc': {'processed': len(batch)}
+            }
+        )
+        return len(batch)
+
+    @staticmethod
+    def _report(migration: Migration, total: int, processed_now: int, started: float) -> None:
+        elapsed = time.monotonic() - started
+        rate = processed_now / elapsed if elapsed > 0 else 0.0
+        logger.info(f"{migration.name}: обработано {total} документов ({rate:.0f} док/с)")
+
+async def main(batch_size: int = 1000, names: Optional[List[str]] = None):
     logger.info("Запуск миграции базы данных")
-    await add_subscription_bonus_field()
+    migrations = [migration for migration in MIGRATIONS if not names or migration.name in names]
+    await MigrationRunner(db, batch_size=batch_size).run(migrations)
     logger.info("Миграция завершена успешно")
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Миграции базы данных")
+    parser.add_argument('--batch-size', type=int, default=1000, help="Размер пачки документов")
+    parser.add_argument('migrations', nargs='*', help="Имена миграций (по умолчанию все)")
+    args = parser.parse_args()
+    asyncio.run(main(batch_size=args.batch_size, names=args.migrations))
@@ -1,8 +1,67 @@
 from datetime import datetime
-from typing import Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+class TrackedModel:
+    """
+    Базовый класс моделей, которые запоминают измененные после загрузки поля.
+    Позволяет операциям с базой отправлять только разницу вместо всего документа.
+    """
+    
+    # Поля-счетчики, изменения которых отправляются через $inc
+    COUNTER_FIELDS: Tuple[str, ...] = ()
+    # Поля, которые никогда не перезаписываются после создания документа
+    IMMUTABLE_FIELDS: Tuple[str, ...] = ()
+    
+    def __setattr__(self, name: str, value: Any) -> None:
+        original = self.__dict__.get('_original')
+        if original is not None and not name.startswith('_') and name not in original:
+            original[name] = self.__dict__.get(name)
+        object.__setattr__(self, name, value)
+    
+    def _start_tracking(self) -> None:
+        """Начать отслеживание изменений (вызывается в конце __init__)"""
+        object.__setattr__(self, '_original', {})
+    
+    def mark_clean(self) -> None:
+        """Считать текущее состояние сохраненным в базе"""
+        self._original.clear()
+    
+    def is_dirty(self) -> bool:
+        """Есть ли несохраненные изменения"""
+        return bool(self.get_update())
+    
+    def get_update(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Сформировать минимальный update-документ MongoDB по измененным полям
+        
+        Returns:
+            Dict: {'$set': {...}, '$inc': {...}} или пустой словарь, если изменений нет
+        """
+        set_fields = {}
+        inc_fields = {}
+        for name, old_value in self._original.items():
+            if name in self.IMMUTABLE_FIELDS:
+                continue
+            new_value = getattr(self, name)
+            if new_value == old_value:
+                continue
+            if name in self.COUNTER_FIELDS and isinstance(old_value, int) and isinstance(new_value, int):
+                inc_fields[name] = new_value - old_value
+            else:
+                set_fields[name] = new_value
+        
+        update = {}
+        if set_fields:
+            update['$set'] = set_fields
+        if inc_fields:
+            update['$inc'] = inc_fields
+        return update
 
 # Модель пользователя
-class User:
+class User(TrackedModel):
+    COUNTER_FIELDS = ('tokens', 'referral_count')
+    IMMUTABLE_FIELDS = ('user_id', 'created_at')
+    
     def __init__(
         self,
         user_id: int,
@@ -14,11 +73,11 @@ class User:
         is_unlimited: bool = False,
         created_at: datetime = None,
         last_activity: datetime = None,
-        chat_history: Optional[List[Dict]] = None,
         referral_code: Optional[str] = None,
         referred_by: Optional[int] = None,
         referral_count: int = 0,
-        has_received_subscription_bonus: bool = False
+        has_received_subscription_bonus: bool = False,
+        paid_tariff: Optional[str] = None
     ):
         self.user_id = user_id
         self.username = username
@@ -29,11 +88,13 @@ class User:
         self.is_unlimited = is_unlimited
         self.created_at = created_at or datetime.now()
         self.last_activity = last_activity or datetime.now()
-        self.chat_history = chat_history or []
         self.referral_code = referral_code
         self.referred_by = referred_by
         self.referral_count = referral_count
         self.has_received_subscription_bonus = has_received_subscription_bonus
+        # Последний оплаченный тариф (None, если пользователь ничего не покупал)
+        self.paid_tariff = paid_tariff
+        self._start_tracking()
     
     @classmethod
     def from_dict(cls, data: Dict) -> 'User':
@@ -47,11 +108,11 @@ class User:
             is_unlimited=data.get('is_unlimited', False),
             created_at=data.get('created_at'),
             last_activity=data.get('last_activity'),
-            chat_history=data.get('chat_history', []),
             referral_code=data.get('referral_code'),
             referred_by=data.get('referred_by'),
             referral_count=data.get('referral_count', 0),
-            has_received_subscription_bonus=data.get('has_received_subscription_bonus', False)
+            has_received_subscription_bonus=data.get('has_received_subscription_bonus', False),
+            paid_tariff=data.get('paid_tariff')
         )
     
     def to_dict(self) -> Dict:
@@ -65,15 +126,80 @@ class User:
             'is_unlimited': self.is_unlimited,
             'created_at': self.created_at,
             'last_activity': self.last_activity,
-            'chat_history': self.chat_history,
             'referral_code': self.referral_code,
             'referred_by': self.referred_by,
             'referral_count': self.referral_count,
-            'has_received_subscription_bonus': self.has_received_subscription_bonus
+            'has_received_subscription_bonus': self.has_received_subscription_bonus,
+            'paid_tariff': self.paid_tariff
+        }
+
+# Облегченное представление пользователя для проверок баланса и статусов.
+# Загружается через проекцию и не используется для записи в базу.
+class UserSummary:
+    FIELDS = ('user_id', 'tokens', 'is_subscribed', 'is_unlimited', 'has_received_subscription_bonus', 'paid_tariff')
+    
+    def __init__(
+        self,
+        user_id: int,
+        tokens: int = 0,
+        is_subscribed: bool = False,
+        is_unlimited: bool = False,
+        has_received_subscription_bonus: bool = False,
+        paid_tariff: Optional[str] = None
+    ):
+        self.user_id = user_id
+        self.tokens = tokens
+        self.is_subscribed = is_subscribed
+        self.is_unlimited = is_unlimited
+        self.has_received_subscription_bonus = has_received_subscription_bonus
+        self.paid_tariff = paid_tariff
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'UserSummary':
+        return cls(
+            user_id=data.get('user_id'),
+            tokens=data.get('tokens', 0),
+            is_subscribed=data.get('is_subscribed', False),
+            is_unlimited=data.get('is_unlimited', False),
+            has_received_subscription_bonus=data.get('has_received_subscription_bonus', False),
+            paid_tariff=data.get('paid_tariff')
+        )
+
+# Модель сообщения из истории чата (коллекция messages)
+class Message:
+    def __init__(
+        self,
+        user_id: int,
+        text: str,
+        is_user: bool,
+        timestamp: datetime = None
+    ):
+        self.user_id = user_id
+        self.text = text
+        self.is_user = is_user
+        self.timestamp = timestamp or datetime.now()
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Message':
+        return cls(
+            user_id=data.get('user_id'),
+            text=data.get('text'),
+            is_user=data.get('is_user', True),
+            timestamp=data.get('timestamp')
+        )
+    
+    def to_dict(self) -> Dict:
+        return {
+            'user_id': self.user_id,
+            'text': self.text,
+            'is_user': self.is_user,
+            'timestamp': self.timestamp
         }
 
 # Модель платежа
-class Payment:
+class Payment(TrackedModel):
+    IMMUTABLE_FIELDS = ('payment_id', 'user_id', 'created_at')
+    
     def __init__(
         self,
         payment_id: str,
@@ -93,6 +219,7 @@ class Payment:
         self.status = status
         self.created_at = created_at or datetime.now()
         self.completed_at = completed_at
+        self._start_tracking()
     
     @classmethod
     def from_dict(cls, data: Dict) -> 'Payment':
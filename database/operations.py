@@ -1,41 +1,52 @@
-import motor.motor_asyncio
-from typing import Dict, List, Optional, Union
+import asyncio
+from typing import Dict, List, Optional, Tuple, Union
 from datetime import datetime
 import uuid
 
 import config
-from database.models import User, Payment, Review
-
-# Подключение к MongoDB
-client = motor.motor_asyncio.AsyncIOMotorClient(config.MONGO_URI)
-db = client[config.DB_NAME]
-
-# Коллекции
-users_collection = db['users']
-payments_collection = db['payments']
-reviews_collection = db['reviews']
+from database.models import User, UserSummary, Message, Payment, Review
+from database.cache import user_cache
+from database.storage import storage
 
 # Операции с пользователями
 async def get_user(user_id: int) -> Optional[User]:
-    """Получить пользователя по ID"""
-    user_data = await users_collection.find_one({'user_id': user_id})
+    """Получить пользователя по ID (с использованием кэша)"""
+    user_data = user_cache.get(user_id)
+    if user_data is None:
+        user_data = await storage.find_user(user_id)
+        if user_data:
+            user_cache.set(user_id, user_data)
     if user_data:
         return User.from_dict(user_data)
     return None
 
+async def get_user_summary(user_id: int) -> Optional[UserSummary]:
+    """Получить баланс и статусы пользователя без загрузки всего документа"""
+    user_data = user_cache.get(user_id, require_full=False)
+    if user_data is None:
+        user_data = await storage.find_user_fields(user_id, list(UserSummary.FIELDS))
+        if user_data:
+            user_cache.set(user_id, user_data, full=False)
+    if user_data:
+        return UserSummary.from_dict(user_data)
+    return None
+
 async def create_user(user: User) -> User:
     """Создать нового пользователя"""
     user_dict = user.to_dict()
-    await users_collection.insert_one(user_dict)
+    await storage.insert_user(user_dict)
+    await storage.increment_counters({'users': 1})
+    user.mark_clean()
+    user_cache.set(user.user_id, user.to_dict())
     return user
 
 async def update_user(user: User) -> User:
-    """Обновить данные пользователя"""
-    user_dict = user.to_dict()
-    await users_collection.update_one(
-        {'user_id': user.user_id},
-        {'$set': user_dict}
-    )
+    """Сохранить измененные поля пользователя (счетчики через $inc)"""
+    update = user.get_update()
+    if update:
+        await storage.update_user(user.user_id, update)
+        user_cache.apply_update(user.user_id, update)
+    user.mark_clean()
     return user
 
 async def get_or_create_user(
@@ -64,15 +75,21 @@ async def add_tokens(user_id: int, tokens: int) -> User:
         await update_user(user)
     return user
 
-async def deduct_tokens(user_id: int, tokens: int) -> Optional[User]:
-    """Списать токены у пользователя"""
-    user = await get_user(user_id)
-    if user and (user.is_unlimited or user.tokens >= tokens):
-        if not user.is_unlimited:
-            user.tokens -= tokens
-        user.last_activity = datetime.now()
-        await update_user(user)
-        return user
+async def deduct_tokens(user_id: int, tokens: int) -> Optional[UserSummary]:
+    """
+    Атомарно списать токены у пользователя за один запрос к базе.
+    
+    Условие `tokens >= n OR is_unlimited` проверяется самим хранилищем,
+    поэтому параллельные сообщения не могут списать один и тот же баланс дважды.
+    Возвращается UserSummary с обновленным балансом или None, если токенов недостаточно.
+    """
+    now = datetime.now()
+    user_data = await storage.deduct_tokens(user_id, tokens, now, list(UserSummary.FIELDS))
+    if user_data:
+        user_cache.set(user_id, {**user_data, 'last_activity': now}, full=False)
+        return UserSummary.from_dict(user_data)
+    # Списание не прошло: закэшированный баланс мог устареть
+    user_cache.invalidate(user_id)
     return None
 
 async def set_subscription_status(user_id: int, is_subscribed: bool) -> User:
@@ -95,29 +112,96 @@ async def set_unlimited_status(user_id: int, is_unlimited: bool) -> User:
         await update_user(user)
     return user
 
-async def add_message_to_history(user_id: int, message: str, is_user: bool) -> User:
-    """Добавить сообщение в историю чата пользователя"""
-    user = await get_user(user_id)
-    if user:
-        message_data = {
-            'text': message,
-            'is_user': is_user,
-            'timestamp': datetime.now()
-        }
-        user.chat_history.append(message_data)
-        await update_user(user)
-    return user
+async def add_message_to_history(user_id: int, message: str, is_user: bool) -> Message:
+    """Добавить сообщение в историю чата пользователя (коллекция messages)"""
+    message_data = Message(user_id=user_id, text=message, is_user=is_user)
+    await asyncio.gather(
+        storage.insert_messages([message_data.to_dict()]),
+        storage.increment_counters({'messages': 1})
+    )
+    return message_data
+
+async def add_messages_to_history(messages: List[Message]) -> List[Message]:
+    """Добавить несколько сообщений в историю чата одним запросом"""
+    if messages:
+        await asyncio.gather(
+            storage.insert_messages([message.to_dict() for message in messages]),
+            storage.increment_counters({'messages': len(messages)})
+        )
+    return messages
+
+async def get_chat_history(user_id: int, limit: int = 20) -> List[Message]:
+    """Получить последние сообщения пользователя в хронологическом порядке"""
+    messages = [Message.from_dict(message_data) for message_data in await storage.find_messages(user_id, limit)]
+    messages.reverse()
+    return messages
+
+async def record_exchange(
+    user_id: int,
+    user_message: str,
+    assistant_message: str,
+    tokens: int,
+    user_message_time: Optional[datetime] = None
+) -> Optional[UserSummary]:
+    """
+    Зафиксировать обмен сообщениями с AI: списать токены и сохранить оба сообщения.
+    
+    Токены и сообщения хранятся в разных коллекциях, а транзакции MongoDB требуют
+    набора реплик, поэтому записи последовательные: сначала атомарное списание
+    (обновляющее и last_activity), и только после него - вставка обоих сообщений
+    одним запросом. Если списать не удалось, ответ пользователю не показывается,
+    поэтому обмен не сохраняется и не учитывается в счетчиках.
+    
+    Returns:
+        UserSummary: Пользователь с обновленным балансом или None, если списать не удалось
+    """
+    updated_user = await deduct_tokens(user_id, tokens)
+    if updated_user is None:
+        return None
+    await add_messages_to_history([
+        Message(user_id=user_id, text=user_message, is_user=True, timestamp=user_message_time),
+        Message(user_id=user_id, text=assistant_message, is_user=False)
+    ])
+    return updated_user
+
+# Контексты памяти диалогов
+async def save_memory_contexts(sizes: Dict[int, int]) -> None:
+    """Сохранить размеры контекстов памяти диалогов (0 - контекст очищен)"""
+    await storage.save_memory_contexts(sizes, datetime.now())
+
+async def load_memory_contexts() -> List[Tuple[int, int]]:
+    """Сохраненные размеры контекстов (user_id, размер) от давно обновленных к недавним"""
+    return await storage.load_memory_contexts()
 
 # Операции с платежами
 async def create_payment(payment: Payment) -> Payment:
-    """Создать новый платеж"""
+    """
+    Создать новый платеж.
+    
+    Платеж может сразу создаваться завершенным (Telegram Payments сохраняет его
+    только после успешной оплаты), тогда он учитывается так же, как переход
+    в succeeded в update_payment_status.
+    """
+    if payment.status == 'succeeded' and not payment.completed_at:
+        payment.completed_at = datetime.now()
     payment_dict = payment.to_dict()
-    await payments_collection.insert_one(payment_dict)
+    await storage.insert_payment(payment_dict)
+    payment.mark_clean()
+    if payment.status == 'succeeded':
+        await storage.increment_counters({'payments': 1, 'revenue': payment.amount or 0})
+        await _set_paid_tariff(payment.user_id, payment.tariff)
     return payment
 
+async def _set_paid_tariff(user_id: int, tariff: Optional[str]) -> None:
+    """Запомнить оплаченный тариф пользователя (по нему определяется приоритет запросов к AI)"""
+    user = await get_user(user_id)
+    if user and tariff and user.paid_tariff != tariff:
+        user.paid_tariff = tariff
+        await update_user(user)
+
 async def get_payment(payment_id: str) -> Optional[Payment]:
     """Получить платеж по ID"""
-    payment_data = await payments_collection.find_one({'payment_id': payment_id})
+    payment_data = await storage.find_payment(payment_id)
     if payment_data:
         return Payment.from_dict(payment_data)
     return None
@@ -126,25 +210,24 @@ async def update_payment_status(payment_id: str, status: str) -> Optional[Paymen
     """Обновить статус платежа"""
     payment = await get_payment(payment_id)
     if payment:
+        was_succeeded = payment.status == 'succeeded'
         payment.status = status
         if status == 'succeeded':
             payment.completed_at = datetime.now()
         
-        payment_dict = payment.to_dict()
-        await payments_collection.update_one(
-            {'payment_id': payment.payment_id},
-            {'$set': payment_dict}
-        )
+        update = payment.get_update()
+        if update:
+            await storage.update_payment(payment.payment_id, update)
+        if status == 'succeeded' and not was_succeeded:
+            await storage.increment_counters({'payments': 1, 'revenue': payment.amount or 0})
+            await _set_paid_tariff(payment.user_id, payment.tariff)
+        payment.mark_clean()
         return payment
     return None
 
 async def get_user_payments(user_id: int) -> List[Payment]:
     """Получить все платежи пользователя"""
-    cursor = payments_collection.find({'user_id': user_id})
-    payments = []
-    async for payment_data in cursor:
-        payments.append(Payment.from_dict(payment_data))
-    return payments
+    return [Payment.from_dict(payment_data) for payment_data in await storage.find_payments(user_id)]
 
 # Операции с отзывами
 async def create_review(user_id: int, text: str, rating: Optional[int] = None) -> Review:
@@ -155,24 +238,21 @@ async def create_review(user_id: int, text: str, rating: Optional[int] = None) -
         text=text,
         rating=rating
     )
-    await reviews_collection.insert_one(review.to_dict())
+    await storage.insert_review(review.to_dict())
     return review
 
 async def get_user_reviews(user_id: int) -> List[Review]:
     """Получить все отзывы пользователя"""
-    cursor = reviews_collection.find({'user_id': user_id})
-    reviews = []
-    async for review_data in cursor:
-        reviews.append(Review.from_dict(review_data))
-    return reviews
+    return [Review.from_dict(review_data) for review_data in await storage.find_reviews(user_id)]
 
 async def get_all_reviews() -> List[Review]:
     """Получить все отзывы"""
-    cursor = reviews_collection.find()
-    reviews = []
-    async for review_data in cursor:
-        reviews.append(Review.from_dict(review_data))
-    return reviews
+    return [Review.from_dict(review_data) for review_data in await storage.find_reviews()]
+
+# Обслуживание хранилища
+async def ensure_indexes() -> Dict[str, List[str]]:
+    """Создать недостающие индексы в хранилище (вызывается при старте бота)"""
+    return await storage.ensure_indexes()
 
 # Операции с реферальной системой
 async def generate_referral_code(user_id: int) -> str:
@@ -187,8 +267,11 @@ async def generate_referral_code(user_id: int) -> str:
 
 async def get_user_by_referral_code(referral_code: str) -> Optional[User]:
     """Найти пользователя по реферальному коду"""
-    user_data = await users_collection.find_one({'referral_code': referral_code})
-    return User.from_dict(user_data) if user_data else None
+    user_data = await storage.find_user_by_referral_code(referral_code)
+    if user_data:
+        user_cache.set(user_data['user_id'], user_data)
+        return User.from_dict(user_data)
+    return None
 
 async def process_referral(user_id: int, referrer_code: str) -> bool:
     """Обработать реферальный код и начислить бонусы"""
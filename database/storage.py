@@ -0,0 +1,190 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+class StorageBackend:
+    """
+    Интерфейс хранилища данных бота.
+
+    Бизнес-логика (создание пользователей, начисления, рефералы, кэш) живет в
+    database.operations и работает с хранилищем только через эти методы.
+    Документы передаются в виде словарей в формате to_dict() моделей,
+    обновления - в формате MongoDB: {'$set': {...}, '$inc': {...}}.
+    """
+
+    name = 'base'
+
+    # Пользователи
+    async def find_user(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Полный документ пользователя"""
+        raise NotImplementedError
+
+    async def find_user_fields(self, user_id: int, fields: List[str]) -> Optional[Dict[str, Any]]:
+        """Документ пользователя, содержащий только указанные поля"""
+        raise NotImplementedError
+
+    async def find_user_by_referral_code(self, referral_code: str) -> Optional[Dict[str, Any]]:
+        """Полный документ пользователя по реферальному коду"""
+        raise NotImplementedError
+
+    async def insert_user(self, user_data: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def update_user(self, user_id: int, update: Dict[str, Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    async def deduct_tokens(
+        self,
+        user_id: int,
+        tokens: int,
+        now: datetime,
+        fields: List[str]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Атомарно списать токены, если их достаточно или тариф безлимитный.
+        Возвращает указанные поля после списания или None.
+        """
+        raise NotImplementedError
+
+    # История сообщений
+    async def insert_messages(self, messages: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    async def find_messages(self, user_id: int, limit: int) -> List[Dict[str, Any]]:
+        """Последние сообщения пользователя, от новых к старым"""
+        raise NotImplementedError
+
+    # Платежи
+    async def insert_payment(self, payment_data: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def find_payment(self, payment_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def update_payment(self, payment_id: str, update: Dict[str, Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    async def find_payments(self, user_id: int) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    # Отзывы
+    async def insert_review(self, review_data: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def find_reviews(self, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Отзывы пользователя или все отзывы, если user_id не указан"""
+        raise NotImplementedError
+
+    # Статистика
+    async def increment_counters(self, deltas: Dict[str, float]) -> None:
+        """Увеличить глобальные счетчики (users, messages, payments, revenue)"""
+        raise NotImplementedError
+
+    async def get_counters(self) -> Dict[str, float]:
+        """Текущие значения глобальных счетчиков"""
+        raise NotImplementedError
+
+    async def get_statistics(self, since: datetime) -> Dict[str, Any]:
+        """
+        Общая статистика (из счетчиков) и статистика начиная с момента since.
+        Ключи: total_users, total_messages, total_payments, total_amount,
+        new_users_24h, messages_24h, payments_24h.
+        """
+        raise NotImplementedError
+
+    # Агрегаты по времени
+    async def compute_hourly_metrics(self, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        """
+        Посчитать почасовые метрики по исходным данным за [start, end).
+        Возвращает только часы с активностью, формат см. empty_metrics_bucket.
+        """
+        raise NotImplementedError
+
+    async def save_metrics(self, buckets: List[Dict[str, Any]], watermark: Optional[datetime] = None) -> None:
+        """Сохранить (перезаписать) бакеты по ключу (granularity, start) и отметку агрегации"""
+        raise NotImplementedError
+
+    async def find_metrics(self, granularity: str, since: datetime) -> List[Dict[str, Any]]:
+        """Бакеты указанной гранулярности начиная с since, по возрастанию start"""
+        raise NotImplementedError
+
+    async def get_metrics_watermark(self) -> Optional[datetime]:
+        """Начало часа, с которого нужно продолжить агрегацию"""
+        raise NotImplementedError
+
+    # Снимки памяти диалогов
+    async def save_memory_contexts(self, sizes: Dict[int, int], now: datetime) -> None:
+        """Сохранить размер текущего контекста диалога пользователей (0 - удалить запись)"""
+        raise NotImplementedError
+
+    async def load_memory_contexts(self) -> List[Tuple[int, int]]:
+        """Сохраненные контексты (user_id, размер) от давно обновленных к недавним"""
+        raise NotImplementedError
+
+    # Обслуживание
+    async def ensure_indexes(self) -> Dict[str, List[str]]:
+        """Создать недостающие индексы; возвращает индексы, которые создать не удалось"""
+        return {}
+
+# Глобальные счетчики, которые поддерживаются при записи
+COUNTER_NAMES = ('users', 'messages', 'payments', 'revenue')
+
+def counters_to_statistics(counters: Dict[str, float]) -> Dict[str, Any]:
+    """Преобразовать счетчики в общие поля статистики"""
+    return {
+        "total_users": int(counters.get('users', 0)),
+        "total_messages": int(counters.get('messages', 0)),
+        "total_payments": int(counters.get('payments', 0)),
+        "total_amount": counters.get('revenue', 0)
+    }
+
+def empty_metrics_bucket(granularity: str, start: datetime) -> Dict[str, Any]:
+    """Пустой бакет метрик; payments и revenue разбиты по тарифам"""
+    return {
+        'granularity': granularity,
+        'start': start,
+        'new_users': 0,
+        'messages': 0,
+        'payments': {},
+        'revenue': {}
+    }
+
+def apply_update(document: Dict[str, Any], update: Dict[str, Dict[str, Any]]) -> None:
+    """Применить к документу обновление в формате {'$set': ..., '$inc': ...}"""
+    for name, value in update.get('$set', {}).items():
+        document[name] = value
+    for name, delta in update.get('$inc', {}).items():
+        document[name] = (document.get(name) or 0) + delta
+
+def create_storage(backend: str) -> StorageBackend:
+    """
+    Создать хранилище по имени из конфигурации
+
+    Args:
+        backend: mongo, memory или sqlite
+    """
+    backend = (backend or 'mongo').lower()
+
+    if backend == 'memory':
+        from database.storage_memory import InMemoryStorage
+        logger.info("🗄 Используется хранилище в памяти процесса")
+        return InMemoryStorage()
+
+    if backend == 'sqlite':
+        from database.storage_sqlite import SQLiteStorage
+        logger.info(f"🗄 Используется хранилище SQLite: {config.SQLITE_PATH}")
+        return SQLiteStorage(config.SQLITE_PATH)
+
+    if backend != 'mongo':
+        logger.warning(f"⚠️ Неизвестное хранилище {backend}, используется MongoDB")
+
+    from database.storage_mongo import MongoStorage
+    logger.info("🗄 Используется хранилище MongoDB")
+    return MongoStorage(config.MONGO_URI, config.DB_NAME)
+
+# Создаем хранилище, выбранное в конфигурации
+storage = create_storage(config.STORAGE_BACKEND)
@@ -0,0 +1,192 @@
+import copy
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from database.storage import StorageBackend, COUNTER_NAMES, apply_update, counters_to_statistics, empty_metrics_bucket
+
+class InMemoryStorage(StorageBackend):
+    """
+    Хранилище в памяти процесса.
+    Используется для тестового режима и бенчмарков без MongoDB; данные не сохраняются.
+    Методы не содержат await, поэтому каждая операция атомарна в рамках event loop.
+    """
+
+    name = 'memory'
+
+    def __init__(self):
+        self.users: Dict[int, Dict[str, Any]] = {}
+        self.referral_codes: Dict[str, int] = {}
+        self.messages: Dict[int, List[Dict[str, Any]]] = {}
+        self.payments: Dict[str, Dict[str, Any]] = {}
+        self.reviews: List[Dict[str, Any]] = []
+        self.counters: Dict[str, float] = {name: 0 for name in COUNTER_NAMES}
+        self.metrics: Dict[tuple, Dict[str, Any]] = {}
+        self.metrics_watermark: Optional[datetime] = None
+        self.memory_contexts: Dict[int, Tuple[int, datetime]] = {}
+
+    # Пользователи
+    async def find_user(self, user_id: int) -> Optional[Dict[str, Any]]:
+        user_data = self.users.get(user_id)
+        return copy.deepcopy(user_data) if user_data else None
+
+    async def find_user_fields(self, user_id: int, fields: List[str]) -> Optional[Dict[str, Any]]:
+        user_data = self.users.get(user_id)
+        if not user_data:
+            return None
+        return {field: user_data[field] for field in fields if field in user_data}
+
+    async def find_user_by_referral_code(self, referral_code: str) -> Optional[Dict[str, Any]]:
+        user_id = self.referral_codes.get(referral_code)
+        return await self.find_user(user_id) if user_id is not None else None
+
+    async def insert_user(self, user_data: Dict[str, Any]) -> None:
+        user_id = user_data['user_id']
+        if user_id in self.users:
+            raise ValueError(f"Пользователь {user_id} уже существует")
+        self.users[user_id] = copy.deepcopy(user_data)
+        if user_data.get('referral_code'):
+            self.referral_codes[user_data['referral_code']] = user_id
+
+    async def update_user(self, user_id: int, update: Dict[str, Dict[str, Any]]) -> None:
+        user_data = self.users.get(user_id)
+        if user_data is None:
+            return
+        apply_update(user_data, copy.deepcopy(update))
+        if user_data.get('referral_code'):
+            self.referral_codes[user_data['referral_code']] = user_id
+
+    async def deduct_tokens(
+        self,
+        user_id: int,
+        tokens: int,
+        now: datetime,
+        fields: List[str]
+    ) -> Optional[Dict[str, Any]]:
+        user_data = self.users.get(user_id)
+        if not user_data:
+            return None
+        is_unlimited = user_data.get('is_unlimited') is True
+        if not is_unlimited and user_data.get('tokens', 0) < tokens:
+            return None
+        if not is_unlimited:
+            user_data['tokens'] -= tokens
+        user_data['last_activity'] = now
+        return await self.find_user_fields(user_id, fields)
+
+    # История сообщений
+    async def insert_messages(self, messages: List[Dict[str, Any]]) -> None:
+        for message in messages:
+            self.messages.setdefault(message['user_id'], []).append(dict(message))
+
+    async def find_messages(self, user_id: int, limit: int) -> List[Dict[str, Any]]:
+        history = self.messages.get(user_id, [])
+        return [dict(message) for message in reversed(history[-limit:])]
+
+    # Платежи
+    async def insert_payment(self, payment_data: Dict[str, Any]) -> None:
+        self.payments[payment_data['payment_id']] = dict(payment_data)
+
+    async def find_payment(self, payment_id: str) -> Optional[Dict[str, Any]]:
+        payment_data = self.payments.get(payment_id)
+        return dict(payment_data) if payment_data else None
+
+    async def update_payment(self, payment_id: str, update: Dict[str, Dict[str, Any]]) -> None:
+        payment_data = self.payments.get(payment_id)
+        if payment_data is not None:
+            apply_update(payment_data, update)
+
+    async def find_payments(self, user_id: int) -> List[Dict[str, Any]]:
+        return [dict(payment) for payment in self.payments.values() if payment['user_id'] == user_id]
+
+    # Отзывы
+    async def insert_review(self, review_data: Dict[str, Any]) -> None:
+        self.reviews.append(dict(review_data))
+
+    async def find_reviews(self, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        return [
+            dict(review) for review in self.reviews
+            if user_id is None or review['user_id'] == user_id
+        ]
+
+    # Статистика
+    async def increment_counters(self, deltas: Dict[str, float]) -> None:
+        for name, delta in deltas.items():
+            self.counters[name] = self.counters.get(name, 0) + delta
+
+    async def get_counters(self) -> Dict[str, float]:
+        return dict(self.counters)
+
+    async def get_statistics(self, since: datetime) -> Dict[str, Any]:
+        statistics = counters_to_statistics(self.counters)
+        statistics.update({
+            "new_users_24h": sum(1 for user in self.users.values() if user['created_at'] >= since),
+            "messages_24h": sum(
+                1 for history in self.messages.values()
+                for message in history if message['timestamp'] >= since
+            ),
+            "payments_24h": sum(
+                1 for payment in self.payments.values()
+                if payment['status'] == 'succeeded'
+                and payment['completed_at'] and payment['completed_at'] >= since
+            )
+        })
+        return statistics
+
+    # Агрегаты по времени
+    async def compute_hourly_metrics(self, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        buckets: Dict[datetime, Dict[str, Any]] = {}
+
+        def bucket(moment: datetime) -> Dict[str, Any]:
+            hour = moment.replace(minute=0, second=0, microsecond=0)
+            if hour not in buckets:
+                buckets[hour] = empty_metrics_bucket('hour', hour)
+            return buckets[hour]
+
+        for user in self.users.values():
+            if start <= user['created_at'] < end:
+                bucket(user['created_at'])['new_users'] += 1
+
+        for history in self.messages.values():
+            for message in history:
+                if start <= message['timestamp'] < end:
+                    bucket(message['timestamp'])['messages'] += 1
+
+        for payment in self.payments.values():
+            completed_at = payment.get('completed_at')
+            if payment['status'] == 'succeeded' and completed_at and start <= completed_at < end:
+                hour_bucket = bucket(completed_at)
+                tariff = payment.get('tariff') or 'unknown'
+                hour_bucket['payments'][tariff] = hour_bucket['payments'].get(tariff, 0) + 1
+                hour_bucket['revenue'][tariff] = hour_bucket['revenue'].get(tariff, 0) + payment['amount']
+
+        return [buckets[hour] for hour in sorted(buckets)]
+
+    async def save_metrics(self, buckets: List[Dict[str, Any]], watermark: Optional[datetime] = None) -> None:
+        for bucket in buckets:
+            self.metrics[(bucket['granularity'], bucket['start'])] = copy.deepcopy(bucket)
+        if watermark is not None:
+            self.metrics_watermark = watermark
+
+    async def find_metrics(self, granularity: str, since: datetime) -> List[Dict[str, Any]]:
+        return [
+            copy.deepcopy(bucket)
+            for (bucket_granularity, start), bucket in sorted(self.metrics.items(), key=lambda item: item[0][1])
+            if bucket_granularity == granularity and start >= since
+        ]
+
+    async def get_metrics_watermark(self) -> Optional[datetime]:
+        return self.metrics_watermark
+
+    # Снимки памяти диалогов
+    async def save_memory_contexts(self, sizes: Dict[int, int], now: datetime) -> None:
+        for user_id, size in sizes.items():
+            if size:
+                self.memory_contexts[user_id] = (size, now)
+            else:
+                self.memory_contexts.pop(user_id, None)
+
+    async def load_memory_contexts(self) -> List[Tuple[int, int]]:
+        return [
+            (user_id, size)
+            for user_id, (size, _) in sorted(self.memory_contexts.items(), key=lambda item: item[1][1])
+        ]
@@ -0,0 +1,239 @@
+import motor.motor_asyncio
+from pymongo import DeleteOne, ReplaceOne, ReturnDocument, UpdateOne
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from database.storage import StorageBackend, COUNTER_NAMES, counters_to_statistics, empty_metrics_bucket
+
+class MongoStorage(StorageBackend):
+    """Хранилище на MongoDB (motor)"""
+
+    name = 'mongo'
+
+    def __init__(self, mongo_uri: str, db_name: str):
+        # Подключение к MongoDB
+        self.client = motor.motor_asyncio.AsyncIOMotorClient(mongo_uri)
+        self.db = self.client[db_name]
+
+        # Коллекции
+        self.users_collection = self.db['users']
+        self.payments_collection = self.db['payments']
+        self.reviews_collection = self.db['reviews']
+        # История чатов хранится отдельно от документа пользователя, по одному документу на сообщение
+        self.messages_collection = self.db['messages']
+        # Глобальные счетчики статистики в одном документе
+        self.counters_collection = self.db['counters']
+        # Почасовые и дневные агрегаты для графиков админ-панели
+        self.metrics_collection = self.db['metrics']
+        # Размер контекста памяти диалога каждого пользователя для восстановления после перезапуска
+        self.memory_contexts_collection = self.db['memory_contexts']
+
+    @staticmethod
+    def _projection(fields: List[str]) -> Dict[str, int]:
+        projection = {field: 1 for field in fields}
+        projection['_id'] = 0
+        return projection
+
+    # Пользователи
+    async def find_user(self, user_id: int) -> Optional[Dict[str, Any]]:
+        return await self.users_collection.find_one({'user_id': user_id}, {'_id': 0})
+
+    async def find_user_fields(self, user_id: int, fields: List[str]) -> Optional[Dict[str, Any]]:
+        return await self.users_collection.find_one({'user_id': user_id}, self._projection(fields))
+
+    async def find_user_by_referral_code(self, referral_code: str) -> Optional[Dict[str, Any]]:
+        return await self.users_collection.find_one({'referral_code': referral_code}, {'_id': 0})
+
+    async def insert_user(self, user_data: Dict[str, Any]) -> None:
+        await self.users_collection.insert_one(dict(user_data))
+
+    async def update_user(self, user_id: int, update: Dict[str, Dict[str, Any]]) -> None:
+        await self.users_collection.update_one({'user_id': user_id}, update)
+
+    async def deduct_tokens(
+        self,
+        user_id: int,
+        tokens: int,
+        now: datetime,
+        fields: List[str]
+    ) -> Optional[Dict[str, Any]]:
+        # Условие проверяется внутри find_one_and_update, поэтому параллельные
+        # сообщения не могут списать один и тот же баланс дважды
+        return await self.users_collection.find_one_and_update(
+            {
+                'user_id': user_id,
+                '$or': [
+                    {'is_unlimited': True},
+                    {'tokens': {'$gte': tokens}}
+                ]
+            },
+            [
+                {'$set': {
+                    # Безлимитным пользователям баланс не уменьшаем
+                    'tokens': {'$cond': [
+                        {'$eq': ['$is_unlimited', True]},
+                        '$tokens',
+                        {'$add': ['$tokens', -tokens]}
+                    ]},
+                    'last_activity': now
+                }}
+            ],
+            projection=self._projection(fields),
+            return_document=ReturnDocument.AFTER
+        )
+
+    # История сообщений
+    async def insert_messages(self, messages: List[Dict[str, Any]]) -> None:
+        if len(messages) == 1:
+            await self.messages_collection.insert_one(dict(messages[0]))
+        elif messages:
+            await self.messages_collection.insert_many([dict(message) for message in messages])
+
+    async def find_messages(self, user_id: int, limit: int) -> List[Dict[str, Any]]:
+        cursor = self.messages_collection.find(
+            {'user_id': user_id},
+            {'_id': 0}
+        ).sort('timestamp', -1).limit(limit)
+        return [message_data async for message_data in cursor]
+
+    # Платежи
+    async def insert_payment(self, payment_data: Dict[str, Any]) -> None:
+        await self.payments_collection.insert_one(dict(payment_data))
+
+    async def find_payment(self, payment_id: str) -> Optional[Dict[str, Any]]:
+        return await self.payments_collection.find_one({'payment_id': payment_id}, {'_id': 0})
+
+    async def update_payment(self, payment_id: str, update: Dict[str, Dict[str, Any]]) -> None:
+        await self.payments_collection.update_one({'payment_id': payment_id}, update)
+
+    async def find_payments(self, user_id: int) -> List[Dict[str, Any]]:
+        cursor = self.payments_collection.find({'user_id': user_id}, {'_id': 0})
+        return [payment_data async for payment_data in cursor]
+
+    # Отзывы
+    async def insert_review(self, review_data: Dict[str, Any]) -> None:
+        await self.reviews_collection.insert_one(dict(review_data))
+
+    async def find_reviews(self, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        query = {'user_id': user_id} if user_id is not None else {}
+        cursor = self.reviews_collection.find(query, {'_id': 0})
+        return [review_data async for review_data in cursor]
+
+    # Статистика
+    async def increment_counters(self, deltas: Dict[str, float]) -> None:
+        await self.counters_collection.update_one(
+            {'_id': 'global'},
+            {'$inc': deltas},
+            upsert=True
+        )
+
+    async def get_counters(self) -> Dict[str, float]:
+        counters = await self.counters_collection.find_one({'_id': 'global'}) or {}
+        return {name: counters.get(name, 0) for name in COUNTER_NAMES}
+
+    async def get_statistics(self, since: datetime) -> Dict[str, Any]:
+        # Общие показатели читаются из документа счетчиков
+        statistics = counters_to_statistics(await self.get_counters())
+
+        # Статистика за период (запросы по индексам created_at, timestamp и status+completed_at)
+        statistics["new_users_24h"] = await self.users_collection.count_documents({"created_at": {"$gte": since}})
+        statistics["messages_24h"] = await self.messages_collection.count_documents({"timestamp": {"$gte": since}})
+        statistics["payments_24h"] = await self.payments_collection.count_documents({
+            "status": "succeeded",
+            "completed_at": {"$gte": since}
+        })
+        return statistics
+
+    # Агрегаты по времени
+    async def compute_hourly_metrics(self, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        buckets: Dict[datetime, Dict[str, Any]] = {}
+
+        def bucket(hour: datetime) -> Dict[str, Any]:
+            if hour not in buckets:
+                buckets[hour] = empty_metrics_bucket('hour', hour)
+            return buckets[hour]
+
+        def hourly_count(field: str) -> List[Dict[str, Any]]:
+            return [
+                {'$match': {field: {'$gte': start, '$lt': end}}},
+                {'$group': {
+                    '_id': {'$dateTrunc': {'date': f'${field}', 'unit': 'hour'}},
+                    'count': {'$sum': 1}
+                }}
+            ]
+
+        async for row in self.users_collection.aggregate(hourly_count('created_at')):
+            bucket(row['_id'])['new_users'] = row['count']
+
+        async for row in self.messages_collection.aggregate(hourly_count('timestamp')):
+            bucket(row['_id'])['messages'] = row['count']
+
+        pipeline = [
+            {'$match': {'status': 'succeeded', 'completed_at': {'$gte': start, '$lt': end}}},
+            {'$group': {
+                '_id': {
+                    'hour': {'$dateTrunc': {'date': '$completed_at', 'unit': 'hour'}},
+                    'tariff': '$tariff'
+                },
+                'count': {'$sum': 1},
+                'amount': {'$sum': '$amount'}
+            }}
+        ]
+        async for row in self.payments_collection.aggregate(pipeline):
+            hour_bucket = bucket(row['_id']['hour'])
+            tariff = row['_id']['tariff'] or 'unknown'
+            hour_bucket['payments'][tariff] = row['count']
+            hour_bucket['revenue'][tariff] = row['amount']
+
+        return [buckets[hour] for hour in sorted(buckets)]
+
+    async def save_metrics(self, buckets: List[Dict[str, Any]], watermark: Optional[datetime] = None) -> None:
+        if buckets:
+            await self.metrics_collection.bulk_write([
+                ReplaceOne(
+                    {'granularity': bucket['granularity'], 'start': bucket['start']},
+                    bucket,
+                    upsert=True
+                )
+                for bucket in buckets
+            ], ordered=False)
+        if watermark is not None:
+            await self.counters_collection.update_one(
+                {'_id': 'metrics_rollup'},
+                {'$set': {'watermark': watermark}},
+                upsert=True
+            )
+
+    async def find_metrics(self, granularity: str, since: datetime) -> List[Dict[str, Any]]:
+        cursor = self.metrics_collection.find(
+            {'granularity': granularity, 'start': {'$gte': since}},
+            {'_id': 0}
+        ).sort('start', 1)
+        return [bucket async for bucket in cursor]
+
+    async def get_metrics_watermark(self) -> Optional[datetime]:
+        state = await self.counters_collection.find_one({'_id': 'metrics_rollup'})
+        return state.get('watermark') if state else None
+
+    # Снимки памяти диалогов
+    async def save_memory_contexts(self, sizes: Dict[int, int], now: datetime) -> None:
+        if not sizes:
+            return
+        await self.memory_contexts_collection.bulk_write([
+            UpdateOne({'user_id': user_id}, {'$set': {'size': size, 'updated_at': now}}, upsert=True)
+            if size else DeleteOne({'user_id': user_id})
+            for user_id, size in sizes.items()
+        ], ordered=False)
+
+    async def load_memory_contexts(self) -> List[Tuple[int, int]]:
+        cursor = self.memory_contexts_collection.find(
+            {},
+            {'_id': 0, 'user_id': 1, 'size': 1},
+            batch_size=10000
+        ).sort('updated_at', 1)
+        return [(context['user_id'], context['size']) async for context in cursor]
+
+    # Обслуживание
+    async def ensure_indexes(self) -> Dict[str, List[str]]:
+        from database.indexes import ensure_indexes
+        return await ensure_indexes(self.db)
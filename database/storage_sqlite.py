@@ -0,0 +1,376 @@
+import os
+import json
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from database.storage import StorageBackend, COUNTER_NAMES, counters_to_statistics, empty_metrics_bucket
+
+# Даты хранятся в ISO-формате и восстанавливаются по объявленному типу TIMESTAMP
+sqlite3.register_adapter(datetime, lambda value: value.isoformat())
+sqlite3.register_converter('TIMESTAMP', lambda value: datetime.fromisoformat(value.decode()))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    username TEXT,
+    first_name TEXT,
+    last_name TEXT,
+    tokens INTEGER NOT NULL DEFAULT 0,
+    is_subscribed BOOLEAN NOT NULL DEFAULT 0,
+    is_unlimited BOOLEAN NOT NULL DEFAULT 0,
+    created_at TIMESTAMP,
+    last_activity TIMESTAMP,
+    referral_code TEXT UNIQUE,
+    referred_by INTEGER,
+    referral_count INTEGER NOT NULL DEFAULT 0,
+    has_received_subscription_bonus BOOLEAN NOT NULL DEFAULT 0,
+    paid_tariff TEXT
+);
+CREATE INDEX IF NOT EXISTS users_created_at ON users (created_at);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    text TEXT,
+    is_user BOOLEAN NOT NULL,
+    timestamp TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS messages_user_id_timestamp ON messages (user_id, timestamp);
+CREATE INDEX IF NOT EXISTS messages_timestamp ON messages (timestamp);
+
+CREATE TABLE IF NOT EXISTS payments (
+    payment_id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    tariff TEXT,
+    amount REAL,
+    tokens INTEGER,
+    status TEXT,
+    created_at TIMESTAMP,
+    completed_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS payments_status_completed_at ON payments (status, completed_at);
+CREATE INDEX IF NOT EXISTS payments_user_id ON payments (user_id);
+
+CREATE TABLE IF NOT EXISTS reviews (
+    review_id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    text TEXT,
+    rating INTEGER,
+    created_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS reviews_user_id_created_at ON reviews (user_id, created_at);
+
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value REAL NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS metrics (
+    granularity TEXT NOT NULL,
+    start TIMESTAMP NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (granularity, start)
+);
+
+CREATE TABLE IF NOT EXISTS metadata (
+    name TEXT PRIMARY KEY,
+    value TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS memory_contexts (
+    user_id INTEGER PRIMARY KEY,
+    size INTEGER NOT NULL,
+    updated_at TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS memory_contexts_updated_at ON memory_contexts (updated_at);
+"""
+
+USER_COLUMNS = (
+    'user_id', 'username', 'first_name', 'last_name', 'tokens', 'is_subscribed',
+    'is_unlimited', 'created_at', 'last_activity', 'referral_code', 'referred_by',
+    'referral_count', 'has_received_subscription_bonus', 'paid_tariff'
+)
+# Колонки, добавленные после первой версии схемы: в существующих базах они создаются в __init__
+ADDED_COLUMNS = {
+    'users': {'paid_tariff': 'TEXT'},
+}
+MESSAGE_COLUMNS = ('user_id', 'text', 'is_user', 'timestamp')
+PAYMENT_COLUMNS = ('payment_id', 'user_id', 'tariff', 'amount', 'tokens', 'status', 'created_at', 'completed_at')
+REVIEW_COLUMNS = ('review_id', 'user_id', 'text', 'rating', 'created_at')
+BOOLEAN_COLUMNS = {'is_subscribed', 'is_unlimited', 'has_received_subscription_bonus', 'is_user'}
+
+class SQLiteStorage(StorageBackend):
+    """
+    Хранилище на SQLite.
+    Запросы к локальному файлу выполняются синхронно: они короче переключения
+    в пул потоков, а отсутствие await делает каждую операцию атомарной в event loop.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path: str = ':memory:'):
+        self.path = path
+        if path != ':memory:' and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(
+            path,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False
+        )
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+        self._add_missing_columns()
+        self.connection.commit()
+
+    def _add_missing_columns(self) -> None:
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {row['name'] for row in self.connection.execute(f"PRAGMA table_info({table})")}
+            for column, column_type in columns.items():
+                if column not in existing:
+                    self.connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+    @staticmethod
+    def _row_to_dict(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        data = dict(row)
+        data.pop('id', None)
+        for column in BOOLEAN_COLUMNS & data.keys():
+            data[column] = bool(data[column])
+        return data
+
+    def _insert(self, table: str, columns: tuple, rows: List[Dict[str, Any]]) -> None:
+        placeholders = ', '.join('?' for _ in columns)
+        self.connection.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+            [tuple(row.get(column) for column in columns) for row in rows]
+        )
+        self.connection.commit()
+
+    def _update(
+        self,
+        table: str,
+        columns: tuple,
+        key: str,
+        key_value: Any,
+        update: Dict[str, Dict[str, Any]]
+    ) -> None:
+        assignments = []
+        params = []
+        for name, value in update.get('$set', {}).items():
+            if name in columns:
+                assignments.append(f"{name} = ?")
+                params.append(value)
+        for name, delta in update.get('$inc', {}).items():
+            if name in columns:
+                assignments.append(f"{name} = COALESCE({name}, 0) + ?")
+                params.append(delta)
+        if not assignments:
+            return
+        params.append(key_value)
+        self.connection.execute(
+            f"UPDATE {table} SET {', '.join(assignments)} WHERE {key} = ?",
+            params
+        )
+        self.connection.commit()
+
+    def _select(self, query: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        return [self._row_to_dict(row) for row in self.connection.execute(query, params)]
+
+    # Пользователи
+    async def find_user(self, user_id: int) -> Optional[Dict[str, Any]]:
+        row = self.connection.execute("SELECT * FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return self._row_to_dict(row)
+
+    async def find_user_fields(self, user_id: int, fields: List[str]) -> Optional[Dict[str, Any]]:
+        columns = [field for field in fields if field in USER_COLUMNS]
+        row = self.connection.execute(
+            f"SELECT {', '.join(columns)} FROM users WHERE user_id = ?",
+            (user_id,)
+        ).fetchone()
+        return self._row_to_dict(row)
+
+    async def find_user_by_referral_code(self, referral_code: str) -> Optional[Dict[str, Any]]:
+        row = self.connection.execute(
+            "SELECT * FROM users WHERE referral_code = ?",
+            (referral_code,)
+        ).fetchone()
+        return self._row_to_dict(row)
+
+    async def insert_user(self, user_data: Dict[str, Any]) -> None:
+        self._insert('users', USER_COLUMNS, [user_data])
+
+    async def update_user(self, user_id: int, update: Dict[str, Dict[str, Any]]) -> None:
+        self._update('users', USER_COLUMNS, 'user_id', user_id, update)
+
+    async def deduct_tokens(
+        self,
+        user_id: int,
+        tokens: int,
+        now: datetime,
+        fields: List[str]
+    ) -> Optional[Dict[str, Any]]:
+        cursor = self.connection.execute(
+            """
+            UPDATE users
+            SET tokens = CASE WHEN is_unlimited THEN tokens ELSE tokens - ? END,
+                last_activity = ?
+            WHERE user_id = ? AND (is_unlimited OR tokens >= ?)
+            """,
+            (tokens, now, user_id, tokens)
+        )
+        self.connection.commit()
+        if cursor.rowcount == 0:
+            return None
+        return await self.find_user_fields(user_id, fields)
+
+    # История сообщений
+    async def insert_messages(self, messages: List[Dict[str, Any]]) -> None:
+        if messages:
+            self._insert('messages', MESSAGE_COLUMNS, messages)
+
+    async def find_messages(self, user_id: int, limit: int) -> List[Dict[str, Any]]:
+        return self._select(
+            "SELECT user_id, text, is_user, timestamp FROM messages "
+            "WHERE user_id = ? ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (user_id, limit)
+        )
+
+    # Платежи
+    async def insert_payment(self, payment_data: Dict[str, Any]) -> None:
+        self._insert('payments', PAYMENT_COLUMNS, [payment_data])
+
+    async def find_payment(self, payment_id: str) -> Optional[Dict[str, Any]]:
+        row = self.connection.execute("SELECT * FROM payments WHERE payment_id = ?", (payment_id,)).fetchone()
+        return self._row_to_dict(row)
+
+    async def update_payment(self, payment_id: str, update: Dict[str, Dict[str, Any]]) -> None:
+        self._update('payments', PAYMENT_COLUMNS, 'payment_id', payment_id, update)
+
+    async def find_payments(self, user_id: int) -> List[Dict[str, Any]]:
+        return self._select("SELECT * FROM payments WHERE user_id = ?", (user_id,))
+
+    # Отзывы
+    async def insert_review(self, review_data: Dict[str, Any]) -> None:
+        self._insert('reviews', REVIEW_COLUMNS, [review_data])
+
+    async def find_reviews(self, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        if user_id is None:
+            return self._select("SELECT * FROM reviews")
+        return self._select("SELECT * FROM reviews WHERE user_id = ?", (user_id,))
+
+    # Статистика
+    async def increment_counters(self, deltas: Dict[str, float]) -> None:
+        self.connection.executemany(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            list(deltas.items())
+        )
+        self.connection.commit()
+
+    async def get_counters(self) -> Dict[str, float]:
+        counters = {name: 0 for name in COUNTER_NAMES}
+        counters.update(self.connection.execute("SELECT name, value FROM counters").fetchall())
+        return counters
+
+    async def get_statistics(self, since: datetime) -> Dict[str, Any]:
+        def scalar(query: str, params: tuple = ()) -> Any:
+            return self.connection.execute(query, params).fetchone()[0]
+
+        statistics = counters_to_statistics(await self.get_counters())
+        statistics.update({
+            "new_users_24h": scalar("SELECT COUNT(*) FROM users WHERE created_at >= ?", (since,)),
+            "messages_24h": scalar("SELECT COUNT(*) FROM messages WHERE timestamp >= ?", (since,)),
+            "payments_24h": scalar(
+                "SELECT COUNT(*) FROM payments WHERE status = 'succeeded' AND completed_at >= ?",
+                (since,)
+            )
+        })
+        return statistics
+
+    # Агрегаты по времени
+    async def compute_hourly_metrics(self, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        buckets: Dict[datetime, Dict[str, Any]] = {}
+
+        def bucket(hour_key: str) -> Dict[str, Any]:
+            # Даты хранятся в ISO-формате, первые 13 символов - "YYYY-MM-DDTHH"
+            hour = datetime.strptime(hour_key, '%Y-%m-%dT%H')
+            if hour not in buckets:
+                buckets[hour] = empty_metrics_bucket('hour', hour)
+            return buckets[hour]
+
+        for hour_key, count in self.connection.execute(
+            "SELECT substr(created_at, 1, 13), COUNT(*) FROM users "
+            "WHERE created_at >= ? AND created_at < ? GROUP BY 1",
+            (start, end)
+        ):
+            bucket(hour_key)['new_users'] = count
+
+        for hour_key, count in self.connection.execute(
+            "SELECT substr(timestamp, 1, 13), COUNT(*) FROM messages "
+            "WHERE timestamp >= ? AND timestamp < ? GROUP BY 1",
+            (start, end)
+        ):
+            bucket(hour_key)['messages'] = count
+
+        for hour_key, tariff, count, amount in self.connection.execute(
+            "SELECT substr(completed_at, 1, 13), tariff, COUNT(*), SUM(amount) FROM payments "
+            "WHERE status = 'succeeded' AND completed_at >= ? AND completed_at < ? GROUP BY 1, 2",
+            (start, end)
+        ):
+            hour_bucket = bucket(hour_key)
+            hour_bucket['payments'][tariff or 'unknown'] = count
+            hour_bucket['revenue'][tariff or 'unknown'] = amount
+
+        return [buckets[hour] for hour in sorted(buckets)]
+
+    async def save_metrics(self, buckets: List[Dict[str, Any]], watermark: Optional[datetime] = None) -> None:
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO metrics (granularity, start, data) VALUES (?, ?, ?)",
+            [
+                (
+                    bucket['granularity'],
+                    bucket['start'],
+                    json.dumps({key: value for key, value in bucket.items() if key not in ('granularity', 'start')})
+                )
+                for bucket in buckets
+            ]
+        )
+        if watermark is not None:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO metadata (name, value) VALUES ('metrics_watermark', ?)",
+                (watermark,)
+            )
+        self.connection.commit()
+
+    async def find_metrics(self, granularity: str, since: datetime) -> List[Dict[str, Any]]:
+        rows = self.connection.execute(
+            "SELECT start, data FROM metrics WHERE granularity = ? AND start >= ? ORDER BY start",
+            (granularity, since)
+        )
+        return [
+            {'granularity': granularity, 'start': start, **json.loads(data)}
+            for start, data in rows
+        ]
+
+    async def get_metrics_watermark(self) -> Optional[datetime]:
+        row = self.connection.execute("SELECT value FROM metadata WHERE name = 'metrics_watermark'").fetchone()
+        return row[0] if row else None
+
+    # Снимки памяти диалогов
+    async def save_memory_contexts(self, sizes: Dict[int, int], now: datetime) -> None:
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO memory_contexts (user_id, size, updated_at) VALUES (?, ?, ?)",
+            [(user_id, size, now) for user_id, size in sizes.items() if size]
+        )
+        self.connection.executemany(
+            "DELETE FROM memory_contexts WHERE user_id = ?",
+            [(user_id,) for user_id, size in sizes.items() if not size]
+        )
+        self.connection.commit()
+
+    async def load_memory_contexts(self) -> List[Tuple[int, int]]:
+        rows = self.connection.execute("SELECT user_id, size FROM memory_contexts ORDER BY updated_at")
+        return [(user_id, size) for user_id, size in rows]
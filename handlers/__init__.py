@@ -16,6 +16,7 @@ from handlers.admin import (
     admin_give_tokens_callback,
     admin_give_unlimited_callback,
     admin_back_callback,
+    admin_trends_callback,
     handle_admin_commands
 )
 
@@ -38,6 +39,7 @@ __all__ = [
     'admin_give_tokens_callback',
     'admin_give_unlimited_callback',
     'admin_back_callback',
+    'admin_trends_callback',
     'handle_admin_commands'
 ]
 
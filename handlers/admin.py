@@ -5,7 +5,8 @@ from datetime import datetime, timedelta
 import logging
 
 import config
-from database import get_user, add_tokens, set_unlimited_status, get_bot_statistics
+from database import get_user_summary, add_tokens, set_unlimited_status, get_bot_statistics, get_metrics_series
+from services import ai_scheduler, ai_service, response_cache, vector_memory_service
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -26,6 +27,11 @@ async def admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     # Меню админа
     keyboard = [
         [InlineKeyboardButton("📊 Статистика", callback_data="admin_stats")],
+        [
+            InlineKeyboardButton("📈 7 дней", callback_data="admin_trends:7d"),
+            InlineKeyboardButton("📈 30 дней", callback_data="admin_trends:30d"),
+            InlineKeyboardButton("🕐 24 часа", callback_data="admin_trends:24h")
+        ],
         [InlineKeyboardButton("🎁 Выдать токены пользователю", callback_data="admin_give_tokens")],
         [InlineKeyboardButton("⭐ Выдать безлимит пользователю", callback_data="admin_give_unlimited")]
     ]
@@ -66,6 +72,56 @@ async def admin_stats_callback(update: Update, context: ContextTypes.DEFAULT_TYP
             f"💬 Сообщений: {stats['messages_24h']}\n"
             f"💰 Платежей: {stats['payments_24h']}\n"
         )
+        
+        queue = ai_scheduler.stats()
+        stats_text += (
+            f"\n🤖 Запросы к AI агенту:\n"
+            f"⚙️ Выполняется: {queue['active']}/{queue['max_concurrency']}\n"
+            f"⏳ В очереди: {queue['queued']}/{queue['max_queue']} "
+            f"(пользователей: {queue['waiting_users']}, максимум: {queue['max_queued']})\n"
+            f"🕐 Ожидание: среднее {queue['wait_avg']:.2f} с, p95 {queue['wait_p95']:.2f} с, "
+            f"максимум {queue['wait_max']:.2f} с\n"
+            f"🚫 Отклонено: {queue['rejected']}\n"
+        )
+        for lane_name, lane in queue['lanes'].items():
+            stats_text += (
+                f"  • {lane_name} (вес {lane['weight']}): в очереди {lane['queued']}, "
+                f"p95 {lane['wait_p95']:.2f} с, отклонено {lane['rejected']}\n"
+            )
+        
+        stats_text += "\n🌐 Адреса AI агента:\n"
+        for endpoint in ai_service.stats():
+            latency = f"{endpoint['latency_ewma']:.2f} с" if endpoint['latency_ewma'] is not None else "нет данных"
+            state = "✅" if endpoint['state'] == 'closed' else "⛔"
+            stats_text += (
+                f"{state} {endpoint['url']}: задержка {latency}, "
+                f"запросов {endpoint['requests']}, ошибок {endpoint['failures']}\n"
+            )
+        
+        if config.AI_HEDGING:
+            hedge = ai_service.get_hedge_stats()
+            delay = f"{hedge['delay']:.2f} с" if hedge['delay'] is not None else "мало замеров"
+            stats_text += (
+                f"\n🔀 Хеджирование: порог {delay}, дублировано {hedge['hedged']} из {hedge['requests']} "
+                f"({hedge['hedge_rate']:.1%}), дубль быстрее в {hedge['win_rate']:.0%}\n"
+            )
+        
+        memory = vector_memory_service.stats()
+        stats_text += (
+            f"\n🧠 Память диалогов: {memory['users']} пользователей, {memory['messages']}/{memory['max_messages']} "
+            f"сообщений, {memory['bytes'] / 1024 / 1024:.1f}/{memory['max_bytes'] / 1024 / 1024:.0f} МБ\n"
+            f"♻️ Вытеснено: {memory['evictions']}, восстановлено из базы: {memory['rehydrations']}\n"
+        )
+        if vector_memory_service.retrieval:
+            stats_text += f"🔎 Сообщений в индексе поиска: {memory['indexed_messages']}\n"
+        
+        if response_cache.enabled:
+            cache = response_cache.stats()
+            stats_text += (
+                f"\n💾 Кэш первых ответов: {cache['size']} записей, "
+                f"{cache['size_bytes'] / 1024:.0f}/{cache['max_bytes'] / 1024:.0f} КБ, "
+                f"попаданий {cache['hits']} из {cache['hits'] + cache['misses']} ({cache['hit_rate']:.1%})\n"
+            )
     except Exception as e:
         logger.error(f"Ошибка при получении статистики: {str(e)}")
         stats_text = "❌ Ошибка при получении статистики. Проверьте логи сервера."
@@ -80,6 +136,85 @@ async def admin_stats_callback(update: Update, context: ContextTypes.DEFAULT_TYP
         reply_markup=reply_markup
     )
 
+def _format_bar(value: int, max_value: int, width: int = 10) -> str:
+    """Горизонтальная полоса для текстового графика"""
+    if max_value <= 0:
+        return ""
+    return "▇" * max(1 if value else 0, round(value / max_value * width))
+
+def _format_trends(buckets: list, period: str) -> str:
+    """Сформировать текст отчета по бакетам метрик"""
+    is_hourly = period == '24h'
+    max_messages = max((bucket['messages'] for bucket in buckets), default=0)
+    
+    title = "🕐 Активность за последние 24 часа" if is_hourly else f"📈 Динамика за {len(buckets)} дней"
+    lines = [f"{title}:\n", "Период: 👤 новые | 💬 сообщения | 💰 платежи"]
+    
+    totals = {'new_users': 0, 'messages': 0, 'payments': 0, 'revenue': 0}
+    revenue_by_tariff = {}
+    for bucket in buckets:
+        payments = sum(bucket['payments'].values())
+        revenue = sum(bucket['revenue'].values())
+        totals['new_users'] += bucket['new_users']
+        totals['messages'] += bucket['messages']
+        totals['payments'] += payments
+        totals['revenue'] += revenue
+        for tariff, amount in bucket['revenue'].items():
+            revenue_by_tariff[tariff] = revenue_by_tariff.get(tariff, 0) + amount
+        
+        label = bucket['start'].strftime('%H:00') if is_hourly else bucket['start'].strftime('%d.%m')
+        lines.append(
+            f"{label}: 👤 {bucket['new_users']} | 💬 {bucket['messages']} {_format_bar(bucket['messages'], max_messages)}"
+            f" | 💰 {payments}"
+        )
+    
+    lines.append(
+        f"\nИтого: 👤 {totals['new_users']} | 💬 {totals['messages']} | "
+        f"💰 {totals['payments']} на {totals['revenue']} ₽"
+    )
+    if revenue_by_tariff:
+        lines.append("По тарифам: " + ", ".join(
+            f"{tariff} - {amount} ₽" for tariff, amount in sorted(revenue_by_tariff.items())
+        ))
+    return "\n".join(lines)
+
+async def admin_trends_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Обработчик просмотра динамики метрик (7/30 дней или 24 часа по часам)"""
+    query = update.callback_query
+    await query.answer()
+    
+    user_id = update.effective_user.id
+    
+    # Проверяем права администратора
+    if user_id not in config.ADMIN_IDS:
+        await query.edit_message_text(
+            text="⛔ У вас нет доступа к админ-панели."
+        )
+        return
+    
+    period = query.data.split(':')[1]
+    
+    # Метрики читаются из заранее агрегированных бакетов
+    try:
+        if period == '24h':
+            buckets = await get_metrics_series('hour', 24)
+        else:
+            buckets = await get_metrics_series('day', 30 if period == '30d' else 7)
+        trends_text = _format_trends(buckets, period)
+    except Exception as e:
+        logger.error(f"Ошибка при получении метрик: {str(e)}")
+        trends_text = "❌ Ошибка при получении метрик. Проверьте логи сервера."
+    
+    keyboard = [
+        [InlineKeyboardButton("🔙 Назад", callback_data="admin_back")]
+    ]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    await query.edit_message_text(
+        text=trends_text,
+        reply_markup=reply_markup
+    )
+
 async def admin_give_tokens_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Обработчик выдачи токенов пользователю"""
     query = update.callback_query
@@ -174,7 +309,7 @@ async def handle_admin_commands(update: Update, context: ContextTypes.DEFAULT_TY
             tokens_amount = int(parts[2])
             
             # Проверяем существование пользователя
-            user = await get_user(target_user_id)
+            user = await get_user_summary(target_user_id)
             if not user:
                 await context.bot.send_message(
                     chat_id=chat_id,
@@ -206,7 +341,7 @@ async def handle_admin_commands(update: Update, context: ContextTypes.DEFAULT_TY
             is_unlimited = int(parts[2]) == 1
             
             # Проверяем существование пользователя
-            user = await get_user(target_user_id)
+            user = await get_user_summary(target_user_id)
             if not user:
                 await context.bot.send_message(
                     chat_id=chat_id,
@@ -2,12 +2,14 @@ from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import ContextTypes
 import logging
 import traceback
+from datetime import datetime
 
 import config
-from database import get_user, deduct_tokens, add_message_to_history
-from services import ai_service  # Используем умный выбор агента
+from database import get_user_summary, add_message_to_history, record_exchange
+from services import ai_service, ai_scheduler, message_coalescer, user_locks, QueueFullError, request_priority  # Используем умный выбор агента
 from handlers.menu import handle_review_text  # Импортируем обработчик отзывов
 from services.subscription import subscription_service
+from utils.streaming_reply import StreamingReply
 
 # Настраиваем логирование
 logger = logging.getLogger(__name__)
@@ -18,6 +20,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     user_id = update.effective_user.id
     chat_id = update.effective_chat.id
     text = message.text
+    received_at = datetime.now()
     
     logger.info(f"[DEBUG] Начало обработки сообщения от пользователя {user_id}")
     logger.info(f"Получено сообщение от пользователя {user_id}: {text}")
@@ -28,8 +31,30 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await handle_review_text(update, context)
         return
     
+    # Быстрые серии сообщений отправляются агенту одним запросом. Это первое ожидание
+    # в обработчике, поэтому серии завершаются в порядке прихода сообщений
+    burst = await message_coalescer.collect(user_id, text, received_at)
+    if burst is None:
+        logger.info(f"[DEBUG] Сообщение пользователя {user_id} будет обработано вместе со следующим")
+        return
+    text, received_at = burst
+    
+    # Сообщения чата обрабатываются параллельно, но сообщения одного пользователя - по очереди:
+    # баланс проверяется и токены списываются только после ответа на предыдущее сообщение.
+    # Между collect и hold нет ожиданий, так что очередь к блокировке совпадает с порядком серий
+    async with user_locks.hold(user_id):
+        await _answer_message(context, user_id, chat_id, text, received_at)
+
+async def _answer_message(
+    context: ContextTypes.DEFAULT_TYPE,
+    user_id: int,
+    chat_id: int,
+    text: str,
+    received_at: datetime
+) -> None:
+    """Проверить пользователя и баланс, получить ответ агента и списать токены"""
     # Получаем пользователя из базы данных
-    user = await get_user(user_id)
+    user = await get_user_summary(user_id)
     logger.info(f"[DEBUG] Получен пользователь из БД: {user}")
     
     if not user:
@@ -86,32 +111,72 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         )
         return
     
+    # Пока AI агент недоступен, сразу сообщаем об этом, не дожидаясь таймаутов
+    if not ai_service.is_available():
+        logger.warning(f"AI агент недоступен, сообщение пользователя {user_id} не отправлено")
+        keyboard = [[InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu")]]
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        await context.bot.send_message(
+            chat_id=chat_id,
+            text=(
+                "⏳ Сейчас я перегружен и не могу ответить. "
+                "Пожалуйста, повторите сообщение через минуту - Майндтокены не списаны."
+            ),
+            reply_markup=reply_markup
+        )
+        return
+    
     # Отправляем индикатор "печатает..."
     await context.bot.send_chat_action(chat_id=chat_id, action="typing")
     logger.info(f"[DEBUG] Отправлен статус 'печатает' для пользователя {user_id}")
     
+    # Ответ показывается по мере генерации, если включена потоковая передача
+    reply = StreamingReply(context.bot, chat_id)
+    
     try:
-        # Сохраняем сообщение пользователя в историю
-        logger.info(f"[DEBUG] Сохраняем сообщение в историю для пользователя {user_id}")
-        await add_message_to_history(user_id, text, is_user=True)
-        
         logger.info(f"[DEBUG] Отправляем запрос к AI агенту для пользователя {user_id}")
-        # Отправляем запрос к ИИ-агенту с поддержкой векторной памяти
-        response = await ai_service.send_message(text, user_id=user_id)
+        # Отправляем запрос к ИИ-агенту с поддержкой векторной памяти через общую очередь
+        response = await ai_scheduler.run(
+            user_id,
+            ai_service.send_message,
+            text,
+            user_id=user_id,
+            stream=config.AI_STREAMING,
+            on_chunk=reply.update,
+            priority=request_priority(user)
+        )
         logger.info(f"[DEBUG] Получен ответ от агента: {response[:100] if response else 'None'}")
         
         if response:
-            logger.info(f"[DEBUG] Списываем токены для пользователя {user_id}")
-            # Если получили ответ от агента, списываем токены и отправляем ответ
-            updated_user = await deduct_tokens(user_id, config.TOKENS_PER_MESSAGE)
+            logger.info(f"[DEBUG] Сохраняем обмен сообщениями и списываем токены для пользователя {user_id}")
+            # Списываем токены и только после успешного списания сохраняем вопрос с ответом в историю
+            updated_user = await record_exchange(
+                user_id,
+                text,
+                response,
+                config.TOKENS_PER_MESSAGE,
+                user_message_time=received_at
+            )
+            if not updated_user:
+                # Баланс изменился после проверки (например, администратором): ответ не выдаем,
+                # а уже показанную часть потокового ответа заменяем сообщением о балансе
+                logger.warning(f"Не удалось списать токены у пользователя {user_id} после ответа AI")
+                # Как и при ошибке агента, сохраняем только вопрос пользователя
+                await add_message_to_history(user_id, text, is_user=True)
+                keyboard = [
+                    [InlineKeyboardButton("💰 Пополнить Майндтокены", callback_data="buy_tokens")],
+                    [InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu")]
+                ]
+                await reply.finish(
+                    f"⚠️ У вас недостаточно Майндтокенов для продолжения диалога. "
+                    f"Стоимость одного сообщения составляет {config.TOKENS_PER_MESSAGE} токенов.",
+                    InlineKeyboardMarkup(keyboard)
+                )
+                return
             logger.info(f"[DEBUG] Токены списаны, обновленный баланс: {updated_user.tokens}")
             
-            # Сохраняем ответ агента в историю
-            logger.info(f"[DEBUG] Сохраняем ответ в историю для пользователя {user_id}")
-            await add_message_to_history(user_id, response, is_user=False)
-            
             # Если пользователь не на безлимитном тарифе, добавляем информацию о балансе
-            if not user.is_unlimited:
+            if not updated_user.is_unlimited:
                 response += f"\n\n💎 Остаток: {updated_user.tokens} Майндтокенов"
             
             # Добавляем кнопку главного меню к каждому ответу
@@ -119,22 +184,29 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             reply_markup = InlineKeyboardMarkup(keyboard)
             
             logger.info(f"[DEBUG] Отправляем ответ пользователю {user_id}")
-            await context.bot.send_message(
-                chat_id=chat_id,
-                text=response,
-                reply_markup=reply_markup
-            )
+            await reply.finish(response, reply_markup)
             logger.info(f"[DEBUG] Ответ успешно отправлен пользователю {user_id}")
         else:
             # В случае ошибки с получением ответа от AI
             logger.error(f"[DEBUG] Не получен ответ от AI агента для пользователя {user_id}")
+            # Сохраняем вопрос пользователя, чтобы он не пропал из истории
+            await add_message_to_history(user_id, text, is_user=True)
             keyboard = [[InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu")]]
             reply_markup = InlineKeyboardMarkup(keyboard)
-            await context.bot.send_message(
-                chat_id=chat_id,
-                text="😔 Извините, возникла техническая проблема при обработке вашего запроса. Пожалуйста, попробуйте позже.",
-                reply_markup=reply_markup
+            # Если часть ответа уже была показана, заменяем ее сообщением об ошибке
+            await reply.finish(
+                "😔 Извините, возникла техническая проблема при обработке вашего запроса. Пожалуйста, попробуйте позже.",
+                reply_markup
             )
+    except QueueFullError:
+        # Очередь переполнена: запрос не выполнялся, токены не списаны
+        keyboard = [[InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu")]]
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        await reply.finish(
+            "⏳ Сейчас очень много обращений, и я не успеваю ответить всем. "
+            "Пожалуйста, повторите сообщение через минуту - Майндтокены не списаны.",
+            reply_markup
+        )
     except Exception as e:
         # Логируем детали исключения для отладки
         error_details = traceback.format_exc()
@@ -143,10 +215,9 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         # Отправляем пользователю сообщение об ошибке
         keyboard = [[InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu")]]
         reply_markup = InlineKeyboardMarkup(keyboard)
-        await context.bot.send_message(
-            chat_id=chat_id,
-            text="😔 Произошла ошибка при обработке вашего сообщения. Наши специалисты уже работают над решением проблемы.",
-            reply_markup=reply_markup
+        await reply.finish(
+            "😔 Произошла ошибка при обработке вашего сообщения. Наши специалисты уже работают над решением проблемы.",
+            reply_markup
         )
 
 async def start_chat_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -160,7 +231,7 @@ async def start_chat_callback(update: Update, context: ContextTypes.DEFAULT_TYPE
     logger.info(f"Пользователь {user_id} запустил диалог")
     
     # Получаем пользователя из базы данных
-    user = await get_user(user_id)
+    user = await get_user_summary(user_id)
     
     # Очищаем векторную память при начале нового диалога
     try:
@@ -85,12 +85,13 @@ async def handle_review_text(update: Update, context: ContextTypes.DEFAULT_TYPE)
     user_id = update.effective_user.id
     review_text = update.message.text
     
+    # Очищаем состояние до записи: сообщения чата обрабатываются параллельно,
+    # и следующее сообщение не должно снова попасть в отзыв
+    context.user_data.pop('state', None)
+    
     # Создаем отзыв в базе данных
     await create_review(user_id, review_text)
     
-    # Очищаем состояние
-    context.user_data.pop('state', None)
-    
     # Показываем благодарность
     keyboard = [[InlineKeyboardButton("🔙 В главное меню", callback_data="main_menu")]]
     reply_markup = InlineKeyboardMarkup(keyboard)
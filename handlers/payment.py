@@ -3,7 +3,7 @@ from telegram.ext import ContextTypes
 import logging
 
 import config
-from database import get_user
+from database import get_user_summary
 from services import payment_service
 
 # Проверяем, доступны ли Telegram платежи
@@ -209,7 +209,7 @@ async def check_payment_callback(update: Update, context: ContextTypes.DEFAULT_T
     
     if status == 'succeeded':
         # Платеж успешно выполнен
-        user = await get_user(user_id)
+        user = await get_user_summary(user_id)
         
         # Формируем сообщение об успешной оплате
         if user.is_unlimited:
@@ -298,7 +298,7 @@ async def successful_payment_handler(update: Update, context: ContextTypes.DEFAU
         )
         
         # Получаем обновленные данные пользователя
-        user = await get_user(user_id)
+        user = await get_user_summary(user_id)
         
         # Формируем сообщение об успешной оплате
         if user.is_unlimited:
@@ -3,7 +3,7 @@ from telegram.ext import ContextTypes
 import logging
 
 import config
-from database import get_user, get_or_create_user, add_tokens, set_subscription_status
+from database import get_user_summary, get_or_create_user, add_tokens, set_subscription_status
 from services import subscription_service
 from handlers.menu import process_referral_code
 
@@ -37,7 +37,7 @@ async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, use
     """Показать главное меню"""
     if not user:
         user_id = update.effective_user.id
-        user = await get_user(user_id)
+        user = await get_user_summary(user_id)
     
     # Создаем клавиатуру с кнопками
     keyboard = [
@@ -3,7 +3,7 @@ from telegram.ext import ContextTypes
 import asyncio
 
 import config
-from database import get_user, set_subscription_status, add_tokens
+from database import get_user_summary, set_subscription_status, add_tokens
 from services.subscription import subscription_service
 from handlers.start import show_main_menu
 
@@ -18,13 +18,13 @@ async def check_subscription_callback(update: Update, context: ContextTypes.DEFA
     is_subscribed = await subscription_service.check_subscription(user_id)
     
     if is_subscribed or config.TEST_MODE:  # В тестовом режиме или при наличии подписки
-        user = await get_user(user_id)
+        user = await get_user_summary(user_id)
         if not user.has_received_subscription_bonus:  # Если бонус еще не был получен
             # Начисляем бонусные токены и отмечаем получение бонуса
             await set_subscription_status(user_id, True)
             
             # Получаем обновленные данные пользователя
-            user = await get_user(user_id)
+            user = await get_user_summary(user_id)
             
             # Показываем благодарственное сообщение
             await query.edit_message_text(
@@ -43,7 +43,7 @@ async def check_subscription_callback(update: Update, context: ContextTypes.DEFA
             # Если бонус уже был получен, просто обновляем статус подписки и показываем главное меню
             if not user.is_subscribed:
                 await set_subscription_status(user_id, True)
-                user = await get_user(user_id)
+                user = await get_user_summary(user_id)
             await show_main_menu(update, context, user, show_description=True)
     else:
         # Пользователь не подписан, предлагаем подписаться
@@ -70,7 +70,7 @@ async def skip_subscription_callback(update: Update, context: ContextTypes.DEFAU
     await query.answer()
     
     user_id = update.effective_user.id
-    user = await get_user(user_id)
+    user = await get_user_summary(user_id)
     
     # Отмечаем, что пользователь пропустил подписку
     await set_subscription_status(user_id, False)
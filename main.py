@@ -17,7 +17,8 @@ import asyncio
 
 import config
 from utils.logging_config import setup_logging, get_logger
-from services import subscription_service
+from services import subscription_service, ai_service, vector_memory_service
+from database import ensure_indexes, metrics_rollup_loop
 from handlers import (
     start_command,
     menu_command,
@@ -36,6 +37,7 @@ from handlers import (
     admin_give_tokens_callback,
     admin_give_unlimited_callback,
     admin_back_callback,
+    admin_trends_callback,
     handle_admin_commands
 )
 from handlers.menu import (
@@ -80,6 +82,44 @@ async def setup_webhook(app: Application) -> None:
     else:
         logger.info("Running in polling mode")
 
+# Фоновые задачи, которые нужно остановить при завершении работы
+background_tasks = []
+
+async def on_startup(app: Application) -> None:
+    """Подготовка инфраструктуры перед началом обработки обновлений"""
+    logger.info("Проверка индексов MongoDB...")
+    await ensure_indexes()
+    
+    logger.info("Открытие пула соединений с AI агентом...")
+    await ai_service.start()
+    
+    if config.VECTOR_MEMORY_SNAPSHOT_INTERVAL > 0:
+        logger.info("Восстановление памяти диалогов...")
+        try:
+            await vector_memory_service.restore_snapshot()
+        except Exception as e:
+            logger.error(f"Не удалось восстановить память диалогов: {str(e)}")
+        background_tasks.append(asyncio.create_task(vector_memory_service.snapshot_loop()))
+    
+    logger.info("Запуск фоновой агрегации метрик")
+    background_tasks.append(asyncio.create_task(metrics_rollup_loop()))
+
+async def on_shutdown(app: Application) -> None:
+    """Остановка фоновых задач и закрытие соединений"""
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    
+    if config.VECTOR_MEMORY_SNAPSHOT_INTERVAL > 0:
+        try:
+            saved = await vector_memory_service.save_snapshot()
+            logger.info(f"Сохранена память диалогов {saved} пользователей")
+        except Exception as e:
+            logger.error(f"Не удалось сохранить память диалогов: {str(e)}")
+    
+    await ai_service.close()
+
 def register_handlers(app: Application) -> None:
     """Регистрация обработчиков команд и колбэков"""
     # Обработчики команд
@@ -107,13 +147,18 @@ def register_handlers(app: Application) -> None:
     app.add_handler(CallbackQueryHandler(admin_give_tokens_callback, pattern="^admin_give_tokens$"))
     app.add_handler(CallbackQueryHandler(admin_give_unlimited_callback, pattern="^admin_give_unlimited$"))
     app.add_handler(CallbackQueryHandler(admin_back_callback, pattern="^admin_back$"))
+    app.add_handler(CallbackQueryHandler(admin_trends_callback, pattern="^admin_trends:"))
     
     # Обработчики для Telegram Payments
     app.add_handler(PreCheckoutQueryHandler(pre_checkout_handler))
     app.add_handler(MessageHandler(filters.SUCCESSFUL_PAYMENT, successful_payment_handler))
     
-    # Обработчик всех текстовых сообщений
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    # Обработчик всех текстовых сообщений. Он не блокирует обработку следующих обновлений:
+    # очередь запросов к AI агенту и объединение серий сообщений работают, только если
+    # один долгий ответ не задерживает остальных. Порядок сообщений одного пользователя
+    # сохраняет user_locks в handlers/chat.py. Остальные обработчики (подписка, рефералы,
+    # платежи, админка) выполняются последовательно
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message, block=False))
     
     # Обработчик админских команд в тексте
     app.add_handler(MessageHandler(filters.TEXT & filters.COMMAND, handle_admin_commands))
@@ -180,6 +225,8 @@ def main() -> None:
         .connect_timeout(30.0)
         .read_timeout(30.0)
         .write_timeout(30.0)
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
         .build()
     )
     logger.info("Application built successfully")
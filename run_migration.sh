@@ -16,7 +16,7 @@ fi
 
 # Запускаем миграцию как модуль
 echo -e "${YELLOW}Выполнение миграции...${NC}"
-python3 -m database.migration
+python3 -m database.migration "$@"
 
 # Проверяем статус
 if [ $? -eq 0 ]; then
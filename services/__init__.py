@@ -1,6 +1,10 @@
 from services.ai_agent import ai_agent
 from services.mock_ai_agent import mock_ai_agent
+from services.scheduler import ai_scheduler, QueueFullError, request_priority
+from services.message_coalescer import message_coalescer
+from services.response_cache import response_cache
 from services.subscription import subscription_service
+from services.user_locks import user_locks
 from services.vector_memory import vector_memory_service
 
 import logging
@@ -81,7 +85,13 @@ __all__ = [
     'ai_agent',
     'mock_ai_agent',
     'ai_service',  # Теперь всегда настоящий AI агент
+    'ai_scheduler',  # Очередь запросов к AI агенту
+    'QueueFullError',
+    'request_priority',
+    'message_coalescer',  # Объединение серий сообщений пользователя
+    'response_cache',  # Кэш ответов на первые сообщения диалога
     'payment_service',  # Умный выбор между Telegram, YooKassa, бесплатным и мок сервисом платежей
     'subscription_service',
+    'user_locks',  # Поочередная обработка сообщений одного пользователя
     'vector_memory_service'  # Сервис векторной памяти
 ] 
\ No newline at end of file
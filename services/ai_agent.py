@@ -1,23 +1,240 @@
 import aiohttp
+import asyncio
+import codecs
+import functools
 import json
 import logging
-from typing import Dict, Optional, List, Any
+import random
+import time
+import uuid
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, List, Any, Tuple
 
 import config
+from database import get_chat_history
+from services.circuit_breaker import CircuitBreaker
+from services.response_cache import response_cache
 from services.vector_memory import vector_memory_service
 
 # Настраиваем логирование
 logger = logging.getLogger(__name__)
 
+# Колбэк потоковой передачи: получает весь накопленный на данный момент текст ответа
+ChunkCallback = Callable[[str], Awaitable[None]]
+
+# Поля, в которых API может передавать фрагмент ответа в потоковом режиме
+STREAM_TEXT_FIELDS = ('response', 'delta', 'content', 'text')
+
+# Коды ответа, которые означают, что запрос не был обработан, и его можно повторить
+RETRY_STATUSES = (429, 503)
+
+class AIAgentError(Exception):
+    """Временная ошибка API агента, после которой запрос можно повторить"""
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Можно ли повторить запрос после ошибки.
+    
+    Агент ведет собственную память диалога, поэтому повторяются только ошибки,
+    после которых сообщение точно не дошло: 429/503 и ошибки установки соединения.
+    Таймаут чтения или разрыв соединения после отправки запроса не повторяются:
+    агент мог уже обработать сообщение, и повтор задвоил бы реплику пользователя.
+    """
+    if isinstance(error, (AIAgentError, aiohttp.ClientConnectorError)):
+        return True
+    # Таймаут установки соединения aiohttp поднимает как ServerTimeoutError из asyncio.TimeoutError,
+    # а таймаут чтения - как ServerTimeoutError без причины
+    return isinstance(error, aiohttp.ServerTimeoutError) and isinstance(error.__cause__, asyncio.TimeoutError)
+
+class AIEndpoint:
+    """
+    Адрес API агента с собственной статистикой.
+    
+    Задержка до получения заголовков ответа сглаживается EWMA, а предохранитель
+    временно исключает адрес из маршрутизации после серии ошибок.
+    """
+    
+    def __init__(self, url: str, agent_id: str):
+        self.url = url
+        self.agent_id = agent_id
+        self.breaker = CircuitBreaker(
+            f'ai_agent:{url}',
+            failure_threshold=config.AI_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=config.AI_BREAKER_RESET_TIMEOUT
+        )
+        self.latency_ewma: Optional[float] = None
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+    
+    def score(self) -> float:
+        """Оценка ожидаемой задержки с учетом выполняющихся запросов (меньше - лучше)"""
+        # Адрес без замеров получает запрос первым, чтобы появилась оценка
+        return (self.latency_ewma or 0.0) * (self.in_flight + 1)
+    
+    def record_latency(self, seconds: float) -> None:
+        if self.latency_ewma is None:
+            self.latency_ewma = seconds
+        else:
+            alpha = config.AI_LATENCY_EWMA_ALPHA
+            self.latency_ewma = alpha * seconds + (1 - alpha) * self.latency_ewma
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'url': self.url,
+            'agent_id': self.agent_id,
+            'state': self.breaker.state,
+            'latency_ewma': self.latency_ewma,
+            'in_flight': self.in_flight,
+            'requests': self.requests,
+            'failures': self.failures
+        }
+
 class AIAgent:
     """Класс для работы с API ИИ-агента с поддержкой векторной памяти"""
     
-    def __init__(self, agent_id: str = config.AI_AGENT_ID, api_url: str = config.AI_AGENT_URL):
+    def __init__(
+        self,
+        agent_id: str = config.AI_AGENT_ID,
+        api_url: str = config.AI_AGENT_URL,
+        endpoints: Optional[List[Tuple[str, str]]] = None
+    ):
+        """
+        Args:
+            agent_id: ID агента основного адреса
+            api_url: Основной адрес API
+            endpoints: Список пар (адрес, ID агента); если не указан, используется
+                AI_AGENT_ENDPOINTS или единственный адрес api_url
+        """
         self.agent_id = agent_id
         self.api_url = api_url
-        logger.info(f"Инициализирован AI агент: agent_id={agent_id}, api_url={api_url}")
+        endpoints = endpoints or config.AI_AGENT_ENDPOINTS or [(api_url, agent_id)]
+        self.endpoints = [AIEndpoint(url, endpoint_agent_id or agent_id) for url, endpoint_agent_id in endpoints]
+        # Общая сессия с пулом keep-alive соединений, создается в start()
+        self.session: Optional[aiohttp.ClientSession] = None
+        # Последние замеры задержки по всем адресам (для p95 порога хеджирования)
+        self.latency_samples: Deque[float] = deque(maxlen=1000)
+        self.hedge_tokens = 0.0
+        self.hedge_stats = {'requests': 0, 'hedged': 0, 'hedge_wins': 0}
+        logger.info(
+            f"Инициализирован AI агент: "
+            + ", ".join(f"agent_id={endpoint.agent_id}, api_url={endpoint.url}" for endpoint in self.endpoints)
+        )
+    
+    def _create_session(self) -> aiohttp.ClientSession:
+        """Создать сессию с пулом соединений и кэшем DNS"""
+        try:
+            # Асинхронный резолвер на aiodns не блокирует event loop на DNS-запросах
+            resolver = aiohttp.AsyncResolver()
+        except RuntimeError:
+            logger.warning("aiodns не установлен, используется стандартный резолвер")
+            resolver = None
+        
+        connector = aiohttp.TCPConnector(
+            limit=config.AI_HTTP_POOL_SIZE,
+            keepalive_timeout=config.AI_HTTP_KEEPALIVE,
+            ttl_dns_cache=config.AI_HTTP_DNS_TTL,
+            resolver=resolver
+        )
+        # Общего ограничения нет: длинные потоковые ответы ограничиваются паузой между чтениями
+        timeout = aiohttp.ClientTimeout(
+            total=None,
+            connect=config.AI_CONNECT_TIMEOUT,
+            sock_read=config.AI_READ_TIMEOUT
+        )
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Вернуть общую сессию, создав ее при первом обращении (если start() не вызывался)"""
+        if self.session is None or self.session.closed:
+            self.session = self._create_session()
+        return self.session
     
-    async def send_message(self, message: str, user_id: int = None, stream: bool = False) -> Optional[str]:
+    async def start(self, prewarm: int = config.AI_HTTP_PREWARM) -> None:
+        """
+        Открыть общую сессию при запуске бота.
+        
+        Args:
+            prewarm: Сколько соединений открыть заранее, чтобы первые сообщения
+                не тратили время на DNS, TCP и TLS
+        """
+        session = self._get_session()
+        logger.info(
+            f"HTTP-сессия AI агента открыта: pool={config.AI_HTTP_POOL_SIZE}, "
+            f"keepalive={config.AI_HTTP_KEEPALIVE}с"
+        )
+        if prewarm > 0:
+            # Соединения распределяются между всеми адресами агента
+            results = await asyncio.gather(
+                *(
+                    self._prewarm_connection(session, self.endpoints[index % len(self.endpoints)].url)
+                    for index in range(prewarm)
+                ),
+                return_exceptions=True
+            )
+            warmed = sum(1 for result in results if result is True)
+            logger.info(f"Прогрето соединений с AI агентом: {warmed}/{prewarm}")
+    
+    async def _prewarm_connection(self, session: aiohttp.ClientSession, url: str) -> bool:
+        """
+        Открыть соединение легким запросом; после ответа оно остается в пуле.
+        Используется GET, а не HEAD: после HEAD aiohttp не возвращает соединение в пул.
+        Код ответа не важен (например, 405), важно только установленное соединение.
+        """
+        try:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                await response.read()
+            return True
+        except Exception as e:
+            logger.debug(f"Не удалось прогреть соединение: {str(e)}")
+            return False
+    
+    async def close(self) -> None:
+        """Закрыть общую сессию при остановке бота"""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+            logger.info("HTTP-сессия AI агента закрыта")
+        self.session = None
+    
+    def is_available(self) -> bool:
+        """Принимает ли агент запросы (False, пока разомкнуты предохранители всех адресов)"""
+        return any(not endpoint.breaker.is_open() for endpoint in self.endpoints)
+    
+    def _choose_endpoint(self, tried: List[AIEndpoint], exclude: Optional[AIEndpoint] = None) -> Optional[AIEndpoint]:
+        """
+        Выбрать адрес с наименьшей ожидаемой задержкой среди доступных.
+        Адреса, на которых запрос уже не удался, используются только если других нет;
+        адрес exclude не выбирается никогда.
+        """
+        candidates = sorted(
+            (
+                endpoint for endpoint in self.endpoints
+                if endpoint is not exclude and not endpoint.breaker.is_open()
+            ),
+            key=lambda endpoint: (endpoint in tried, endpoint.score())
+        )
+        for endpoint in candidates:
+            # В полуоткрытом состоянии проходит только один пробный запрос
+            if endpoint.breaker.allow_request():
+                return endpoint
+        return None
+    
+    def stats(self) -> List[Dict[str, Any]]:
+        """Состояние и задержка каждого адреса агента"""
+        return [endpoint.stats() for endpoint in self.endpoints]
+    
+    @staticmethod
+    def _backoff_delay(attempt: int) -> float:
+        """Экспоненциальная задержка перед повтором со случайным разбросом (full jitter)"""
+        return random.uniform(0, min(config.AI_RETRY_MAX_DELAY, config.AI_RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+    
+    async def send_message(
+        self,
+        message: str,
+        user_id: int = None,
+        stream: bool = False,
+        on_chunk: Optional[ChunkCallback] = None
+    ) -> Optional[str]:
         """
         Отправить сообщение ИИ-агенту и получить ответ.
         Поддерживает векторную память, если указан user_id.
@@ -26,16 +243,49 @@ class AIAgent:
             message: Текст сообщения
             user_id: ID пользователя для сохранения контекста
             stream: Использовать ли потоковую передачу ответа
+            on_chunk: Колбэк, вызываемый по мере получения ответа с накопленным текстом
+                (только при stream=True)
             
         Returns:
-            str: Ответ от ИИ-агента
+            str: Ответ от ИИ-агента или None, если ответ получить не удалось
+        
+        Запрос уходит на адрес с наименьшей EWMA-задержкой. Ошибки, после которых
+        запрос точно не обработан (429, 503, ошибки и таймаут установки соединения,
+        см. is_retryable), повторяются до AI_MAX_RETRIES раз: сначала
+        без паузы на другом адресе, если он есть, иначе на том же после паузы.
+        Потоковый запрос не повторяется, если часть ответа уже передана в on_chunk.
+        Пока разомкнуты предохранители всех адресов, запрос сразу возвращает None.
+        
+        Первое сообщение пользователя без истории сначала ищется в кэше ответов,
+        и при попадании запрос к API не выполняется (см. _is_first_message).
+        С включенным VECTOR_MEMORY_RETRIEVAL в поле memories передаются
+        найденные старые сообщения пользователя, близкие к вопросу.
         """
+        cache_key = response_cache.make_key(message, self.agent_id)
+        if cache_key is not None and not await self._is_first_message(user_id):
+            cache_key = None
+        if cache_key is not None:
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Ответ на первое сообщение пользователя {user_id} взят из кэша")
+                if user_id is not None:
+                    await vector_memory_service.add_message(user_id, "user", message)
+                    await vector_memory_service.add_message(user_id, "assistant", cached)
+                if stream and on_chunk:
+                    await on_chunk(cached)
+                return cached
+        
+        if not self.is_available():
+            logger.warning(f"AI агент временно недоступен, запрос пользователя {user_id} отклонен")
+            return None
         
-        # Базовый payload с обязательными параметрами
+        # Базовый payload с обязательными параметрами (agent_id зависит от выбранного адреса)
         payload = {
             "agent_id": self.agent_id,
             "message": message,
-            "stream": stream
+            "stream": stream,
+            # Один ключ на сообщение, общий для повторов и дублей: по нему API может отбрасывать повторы
+            "request_id": uuid.uuid4().hex
         }
         
         # Если указан user_id, добавляем его в запрос для поддержки векторной памяти на стороне API
@@ -43,6 +293,11 @@ class AIAgent:
             # Преобразуем user_id в строку, т.к. некоторые API ожидают строковые идентификаторы
             payload["user_id"] = str(user_id)
             
+            # Старые сообщения пользователя, близкие по смыслу к вопросу (ищутся до добавления вопроса)
+            memories = await vector_memory_service.search(user_id, message)
+            if memories:
+                payload["memories"] = [memory._asdict() for memory in memories]
+            
             # Также добавляем сообщение в локальную память для резервного хранения
             await vector_memory_service.add_message(user_id, "user", message)
             
@@ -52,37 +307,332 @@ class AIAgent:
         
         logger.debug(f"Полезная нагрузка запроса к API: {json.dumps(payload)}")
         
+        delivered = False
+        
+        async def track_chunk(text: str) -> None:
+            nonlocal delivered
+            delivered = True
+            await on_chunk(text)
+        
+        tried: List[AIEndpoint] = []
+        attempts = 0
+        
+        while attempts <= config.AI_MAX_RETRIES:
+            endpoint = self._choose_endpoint(tried)
+            if endpoint is None:
+                logger.warning("Нет доступных адресов AI агента")
+                break
+            
+            if endpoint in tried:
+                # Все адреса уже пробовали, повторяем на лучшем из них после паузы
+                delay = self._backoff_delay(tried.count(endpoint))
+                logger.info(f"Повтор запроса к {endpoint.url} через {delay:.2f} с (попытка {attempts + 1})")
+                await asyncio.sleep(delay)
+            elif tried:
+                logger.info(f"Переключение на адрес {endpoint.url} (попытка {attempts + 1})")
+            tried.append(endpoint)
+            attempts += 1
+            
+            try:
+                response_text = await self._post(endpoint, payload, stream, track_chunk if on_chunk else None)
+            except (AIAgentError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(
+                    f"Временная ошибка при запросе к ИИ-агенту {endpoint.url}: {type(e).__name__} {str(e)}"
+                )
+                if delivered or not is_retryable(e):
+                    # Запрос мог быть обработан (или пользователь уже видит часть ответа),
+                    # повтор привел бы к дублированию
+                    break
+                continue
+            except Exception as e:
+                logger.exception(f"Исключение при запросе к ИИ-агенту: {str(e)}")
+                return None
+            
+            if response_text is None:
+                return None
+            
+            if cache_key is not None:
+                response_cache.set(cache_key, response_text)
+            
+            # Если используется векторная память, сохраняем ответ ассистента в локальную память
+            if user_id is not None:
+                await vector_memory_service.add_message(user_id, "assistant", response_text)
+                logger.info(f"Сохранен ответ AI агента для пользователя {user_id}: {response_text[:50]}...")
+            
+            return response_text
+        
+        logger.error(f"Не удалось получить ответ ИИ-агента после {attempts} попыток")
+        return None
+    
+    @staticmethod
+    async def _is_first_message(user_id: Optional[int]) -> bool:
+        """
+        Можно ли ответить из кэша: у пользователя нет ни локального контекста, ни сохраненной истории.
+        
+        API агента хранит свою память по user_id, и она не очищается вместе с локальной
+        (например, после /start), поэтому пустого локального контекста недостаточно:
+        кэш используется только для пользователей, которые еще ни разу не писали боту.
+        Вопрос и ответ из кэша API не видит - агент узнает о диалоге со второго сообщения,
+        а первый обмен остается в локальной памяти и истории сообщений.
+        """
+        if user_id is None:
+            return True
+        if await vector_memory_service.get_memory(user_id):
+            return False
+        try:
+            return not await get_chat_history(user_id, limit=1)
+        except Exception as e:
+            logger.error(f"Не удалось проверить историю пользователя {user_id}: {str(e)}")
+            return False
+    
+    async def _post(
+        self,
+        endpoint: AIEndpoint,
+        payload: Dict[str, Any],
+        stream: bool,
+        on_chunk: Optional[ChunkCallback]
+    ) -> Optional[str]:
+        """
+        Один запрос к адресу endpoint (с возможным дублирующим запросом, см. _open).
+        Успех или ошибка учитываются в предохранителе адреса, который ответил.
+        
+        Returns:
+            str: Текст ответа или None при ошибке без повтора (4xx и 5xx, кроме 503)
+        
+        Raises:
+            AIAgentError: Сервис не принял запрос (429, 503)
+        """
+        served, response = await self._open(endpoint, payload)
         try:
-            async with aiohttp.ClientSession() as session:
-                logger.debug(f"Отправка POST запроса на {self.api_url}")
+            async with response:
+                status_code = response.status
+                logger.debug(f"Получен ответ от API {served.url} с кодом: {status_code}")
                 
-                async with session.post(self.api_url, json=payload) as response:
-                    status_code = response.status
-                    logger.debug(f"Получен ответ от API с кодом: {status_code}")
-                    
-                    if status_code == 200:
+                if status_code == 200:
+                    if stream:
+                        response_text = await self._read_stream(response, on_chunk)
+                        logger.debug(f"Потоковый ответ от API получен полностью: {response_text[:200]}...")
+                    else:
                         result = await response.json()
                         logger.debug(f"Успешный ответ от API: {json.dumps(result)[:200]}...")
-                        
-                        if stream:
-                            # Обработка потокового ответа если понадобится
-                            pass
-                        
                         response_text = result.get('response', '')
-                        
-                        # Если используется векторная память, сохраняем ответ ассистента в локальную память
-                        if user_id is not None:
-                            await vector_memory_service.add_message(user_id, "assistant", response_text)
-                            logger.info(f"Сохранен ответ AI агента для пользователя {user_id}: {response_text[:50]}...")
-                        
-                        return response_text
-                    else:
-                        response_content = await response.text()
-                        logger.error(f"Ошибка при запросе к ИИ-агенту: {status_code} - {response_content}")
-                        return None
-        except Exception as e:
-            logger.exception(f"Исключение при запросе к ИИ-агенту: {str(e)}")
+                else:
+                    response_content = await response.text()
+                    if status_code in RETRY_STATUSES:
+                        raise AIAgentError(f"{status_code} - {response_content[:200]}")
+                    logger.error(f"Ошибка при запросе к ИИ-агенту: {status_code} - {response_content}")
+                    response_text = None
+        except asyncio.CancelledError:
+            # Чтение ответа отменено: результат пробного запроса неизвестен
+            served.breaker.release_probe()
+            raise
+        except Exception:
+            served.failures += 1
+            served.breaker.record_failure()
+            raise
+        
+        if status_code >= 500:
+            # Ошибка сервера без повтора, но для предохранителя это сбой
+            served.failures += 1
+            served.breaker.record_failure()
+            return None
+        
+        # Сервис ответил (в том числе ошибкой клиента 4xx), значит он доступен
+        served.breaker.record_success()
+        return response_text
+    
+    async def _open_response(self, endpoint: AIEndpoint, payload: Dict[str, Any]) -> aiohttp.ClientResponse:
+        """
+        Отправить запрос и дождаться заголовков ответа.
+        Время до заголовков учитывается в EWMA адреса и в общей выборке для порога хеджирования.
+        """
+        session = self._get_session()
+        logger.debug(f"Отправка POST запроса на {endpoint.url}")
+        
+        endpoint.requests += 1
+        endpoint.in_flight += 1
+        started = time.monotonic()
+        try:
+            response = await session.post(endpoint.url, json={**payload, "agent_id": endpoint.agent_id})
+        except asyncio.CancelledError:
+            # Проигравший дублирующий запрос отменен, это не сбой адреса
+            endpoint.breaker.release_probe()
+            raise
+        except Exception:
+            endpoint.failures += 1
+            endpoint.breaker.record_failure()
+            raise
+        finally:
+            endpoint.in_flight -= 1
+        
+        latency = time.monotonic() - started
+        endpoint.record_latency(latency)
+        self.latency_samples.append(latency)
+        return response
+    
+    @staticmethod
+    def _can_hedge(payload: Dict[str, Any]) -> bool:
+        """
+        Можно ли дублировать запрос.
+        
+        Отмена проигравшего запроса не отменяет того, что сервер уже получил, а агент
+        ведет память диалога по user_id: дубль задвоил бы реплику пользователя.
+        Поэтому запросы с user_id дублируются, только если API агента отбрасывает
+        повторы с тем же request_id (AI_AGENT_DEDUPLICATES).
+        """
+        return "user_id" not in payload or config.AI_AGENT_DEDUPLICATES
+    
+    def _hedge_delay(self) -> Optional[float]:
+        """Через сколько секунд без ответа отправлять дублирующий запрос (None - не отправлять)"""
+        if not config.AI_HEDGING or len(self.latency_samples) < config.AI_HEDGE_MIN_SAMPLES:
             return None
+        samples = sorted(self.latency_samples)
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        return max(config.AI_HEDGE_MIN_DELAY, p95)
+    
+    async def _open(self, endpoint: AIEndpoint, payload: Dict[str, Any]) -> Tuple[AIEndpoint, aiohttp.ClientResponse]:
+        """
+        Открыть ответ, при необходимости с хеджированием.
+        
+        Если заголовки ответа не получены за текущий p95 задержки и позволяет бюджет,
+        тот же запрос отправляется на другой адрес (на тот же адрес дубль не отправляется,
+        запросы с user_id - см. _can_hedge). Используется ответ, пришедший первым,
+        второй запрос отменяется.
+        
+        Returns:
+            Адрес, который ответил, и ответ
+        """
+        # Каждый запрос пополняет бюджет дублирующих запросов на долю AI_HEDGE_BUDGET
+        self.hedge_stats['requests'] += 1
+        self.hedge_tokens = min(config.AI_HEDGE_BUDGET_BURST, self.hedge_tokens + config.AI_HEDGE_BUDGET)
+        
+        primary = asyncio.create_task(self._open_response(endpoint, payload))
+        legs = {primary: endpoint}
+        try:
+            delay = self._hedge_delay() if self._can_hedge(payload) else None
+            if delay is None:
+                return endpoint, await primary
+            
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return endpoint, primary.result()
+            
+            hedge_endpoint = self._choose_endpoint([endpoint], exclude=endpoint)
+            if hedge_endpoint is None or self.hedge_tokens < 1:
+                return endpoint, await primary
+            
+            self.hedge_tokens -= 1
+            self.hedge_stats['hedged'] += 1
+            logger.info(f"Нет ответа от {endpoint.url} за {delay:.2f} с, дублируем запрос на {hedge_endpoint.url}")
+            hedge = asyncio.create_task(self._open_response(hedge_endpoint, payload))
+            legs[hedge] = hedge_endpoint
+            
+            pending = set(legs)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.exception() is None), None)
+                if winner is None:
+                    continue
+                # Лишние ответы, пришедшие одновременно с победителем, закрываем
+                for task in done:
+                    if task is not winner and task.exception() is None:
+                        self._release_leg(task, legs[task])
+                if winner is hedge:
+                    self.hedge_stats['hedge_wins'] += 1
+                return legs[winner], winner.result()
+            
+            # Оба запроса завершились ошибкой
+            raise primary.exception()
+        finally:
+            for task in legs:
+                if not task.done():
+                    task.cancel()
+                    task.add_done_callback(functools.partial(self._release_leg, endpoint=legs[task]))
+    
+    @staticmethod
+    def _release_leg(task: asyncio.Task, endpoint: AIEndpoint) -> None:
+        """
+        Закрыть ответ проигравшего запроса, если он успел прийти до отмены.
+        Ответ не читается, поэтому место пробного запроса адреса освобождается без результата.
+        """
+        if not task.cancelled() and task.exception() is None:
+            task.result().release()
+            endpoint.breaker.release_probe()
+    
+    def get_hedge_stats(self) -> Dict[str, Any]:
+        """Доля дублированных запросов и доля побед дубля"""
+        stats = dict(self.hedge_stats)
+        stats['hedge_rate'] = stats['hedged'] / stats['requests'] if stats['requests'] else 0.0
+        stats['win_rate'] = stats['hedge_wins'] / stats['hedged'] if stats['hedged'] else 0.0
+        stats['delay'] = self._hedge_delay()
+        return stats
+    
+    async def _read_stream(self, response: aiohttp.ClientResponse, on_chunk: Optional[ChunkCallback]) -> str:
+        """
+        Прочитать потоковый ответ API по мере поступления.
+        
+        Поддерживаются SSE (text/event-stream, строки data: ... до [DONE]),
+        NDJSON (по JSON-объекту в строке) и простой текст частями (chunked).
+        Если API проигнорировал stream и вернул обычный JSON, он тоже обрабатывается.
+        """
+        content_type = response.content_type
+        
+        if content_type == 'application/json':
+            result = await response.json()
+            response_text = result.get('response', '')
+            if on_chunk and response_text:
+                await on_chunk(response_text)
+            return response_text
+        
+        parts: List[str] = []
+        
+        async def append(delta: str) -> None:
+            if delta:
+                parts.append(delta)
+                if on_chunk:
+                    await on_chunk(''.join(parts))
+        
+        if content_type in ('text/event-stream', 'application/x-ndjson', 'application/jsonl'):
+            is_sse = content_type == 'text/event-stream'
+            async for raw_line in response.content:
+                line = raw_line.decode('utf-8').strip()
+                if not line:
+                    continue
+                if is_sse:
+                    # Служебные поля SSE (event:, id:, комментарии) пропускаем
+                    if not line.startswith('data:'):
+                        continue
+                    line = line[len('data:'):].strip()
+                    if line == '[DONE]':
+                        break
+                await append(self._parse_stream_chunk(line))
+        else:
+            # Простой текст: байты могут разрезать многобайтовый символ, поэтому декодер инкрементальный
+            decoder = codecs.getincrementaldecoder('utf-8')()
+            async for data in response.content.iter_any():
+                await append(decoder.decode(data))
+            await append(decoder.decode(b'', final=True))
+        
+        return ''.join(parts)
+    
+    @staticmethod
+    def _parse_stream_chunk(data: str) -> str:
+        """Извлечь текст из одного события потока (JSON-объект, JSON-строка или простой текст)"""
+        try:
+            chunk = json.loads(data)
+        except ValueError:
+            return data
+        
+        if isinstance(chunk, str):
+            return chunk
+        if not isinstance(chunk, dict):
+            return ''
+        for field in STREAM_TEXT_FIELDS:
+            if isinstance(chunk.get(field), str):
+                return chunk[field]
+        # Формат OpenAI: {"choices": [{"delta": {"content": "..."}}]}
+        choices = chunk.get('choices') or [{}]
+        return (choices[0].get('delta') or {}).get('content') or ''
     
     async def clear_memory(self, user_id: int) -> None:
         """Очистить историю диалога для пользователя в локальной памяти"""
@@ -0,0 +1,75 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class CircuitBreaker:
+    """
+    Предохранитель для внешнего сервиса.
+
+    После failure_threshold неудачных запросов подряд цепь размыкается,
+    и запросы сразу отклоняются в течение reset_timeout секунд.
+    Затем пропускается один пробный запрос: успех замыкает цепь,
+    неудача снова размыкает ее на reset_timeout.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.failures = 0
+        self.opened_at = 0.0
+        self._state = self.CLOSED
+        # В полуоткрытом состоянии одновременно допускается только один пробный запрос
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self._state
+
+    def is_open(self) -> bool:
+        """Отклоняются ли сейчас все запросы (без изменения состояния)"""
+        return self.state == self.OPEN
+
+    def allow_request(self) -> bool:
+        """Можно ли выполнить запрос; в полуоткрытом состоянии занимает место пробного запроса"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self._state != self.CLOSED:
+            logger.info(f"Цепь {self.name} замкнута: сервис снова отвечает")
+        self._state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._state == self.OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(
+                    f"Цепь {self.name} разомкнута после {self.failures} ошибок подряд "
+                    f"на {self.reset_timeout} с"
+                )
+            self._state = self.OPEN
+            self.opened_at = time.monotonic()
+        self._probe_in_flight = False
+    
+    def release_probe(self) -> None:
+        """
+        Освободить место пробного запроса, не меняя состояние цепи.
+        Для запросов, отмененных до результата: иначе цепь не пропустит новый пробный запрос.
+        """
+        self._probe_in_flight = False
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+class MessageBurst:
+    """Серия сообщений пользователя, которые будут отправлены агенту одним запросом"""
+
+    __slots__ = ('texts', 'received_at', 'deadline', 'version')
+
+    def __init__(self, received_at: datetime, deadline: float):
+        self.texts: List[str] = []
+        # Время первого сообщения серии, с ним вопрос сохраняется в историю
+        self.received_at = received_at
+        self.deadline = deadline
+        self.version = 0
+
+class MessageCoalescer:
+    """
+    Объединение быстрых серий сообщений пользователя.
+
+    Каждое сообщение ждет window секунд; если за это время пришло следующее,
+    ожидание начинается заново, а текст добавляется к серии. Серию обрабатывает
+    последнее сообщение: агенту уходит один запрос, а пользователь получает один ответ
+    и одно списание токенов. Серия не ждет дольше max_delay с первого сообщения.
+    При window = 0 сообщения обрабатываются сразу.
+    """
+
+    def __init__(
+        self,
+        window: float = config.MESSAGE_DEBOUNCE_MS / 1000,
+        max_delay: float = config.MESSAGE_DEBOUNCE_MAX_MS / 1000
+    ):
+        self.window = window
+        self.max_delay = max_delay
+        self.bursts: Dict[int, MessageBurst] = {}
+        # Сколько сообщений было присоединено к чужим сериям
+        self.merged = 0
+
+    async def collect(self, user_id: int, text: str, received_at: datetime) -> Optional[Tuple[str, datetime]]:
+        """
+        Добавить сообщение к серии пользователя и дождаться ее окончания.
+
+        Returns:
+            (объединенный текст, время первого сообщения), если это сообщение завершает серию,
+            или None, если серию обработает следующее сообщение
+        """
+        if self.window <= 0:
+            return text, received_at
+
+        burst = self.bursts.get(user_id)
+        if burst is None:
+            burst = self.bursts[user_id] = MessageBurst(received_at, time.monotonic() + self.max_delay)
+        burst.texts.append(text)
+        burst.version += 1
+        version = burst.version
+
+        await asyncio.sleep(max(0.0, min(self.window, burst.deadline - time.monotonic())))
+
+        if self.bursts.get(user_id) is not burst or burst.version != version:
+            return None
+        del self.bursts[user_id]
+
+        if len(burst.texts) > 1:
+            self.merged += len(burst.texts) - 1
+            logger.info(f"Объединено {len(burst.texts)} сообщений пользователя {user_id} в один запрос")
+        return '\n'.join(burst.texts), burst.received_at
+
+# Создаем экземпляр для использования в других модулях
+message_coalescer = MessageCoalescer()
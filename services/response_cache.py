@@ -0,0 +1,128 @@
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Примерные накладные расходы Python на одну запись (кортеж ключа, строки, список записи)
+ENTRY_OVERHEAD = 200
+
+# Все, кроме букв, цифр и пробелов: пунктуация, эмодзи, символы
+_NON_WORD = re.compile(r'[^\w\s]+')
+_SPACES = re.compile(r'\s+')
+
+def normalize_prompt(text: str) -> str:
+    """
+    Привести текст сообщения к виду, в котором совпадают почти одинаковые вопросы:
+    нижний регистр, ё -> е, без пунктуации и эмодзи, одиночные пробелы.
+    """
+    text = text.lower().replace('ё', 'е')
+    text = _NON_WORD.sub(' ', text)
+    return _SPACES.sub(' ', text).strip()
+
+class ResponseCache:
+    """
+    Кэш ответов AI агента на первые сообщения диалога.
+
+    Ключ - нормализованный текст вопроса и agent_id. Кэшируются только ответы
+    на первое сообщение пользователя без истории (ни локальной, ни в API агента),
+    поэтому один ответ подходит любому пользователю. Объем ограничен max_bytes
+    (строки в UTF-8 плюс накладные расходы на запись), устаревшие по TTL записи
+    удаляются при обращении, при переполнении вытесняются давно не использованные.
+
+    Методы синхронные и не содержат await, поэтому блокировки не нужны.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = config.AI_RESPONSE_CACHE_MAX_BYTES,
+        ttl: float = config.AI_RESPONSE_CACHE_TTL,
+        max_prompt_chars: int = config.AI_RESPONSE_CACHE_MAX_PROMPT,
+        enabled: bool = config.AI_RESPONSE_CACHE
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_prompt_chars = max_prompt_chars
+        self._enabled = enabled
+        # Ключ -> (ответ, размер записи, время устаревания)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, int, float]]" = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled and self.max_bytes > 0 and self.ttl > 0
+
+    def make_key(self, message: str, agent_id: str) -> Optional[Tuple[str, str]]:
+        """Ключ кэша или None, если сообщение не подходит для кэширования (пустое или длинное)"""
+        if not self.enabled or len(message) > self.max_prompt_chars:
+            return None
+        normalized = normalize_prompt(message)
+        if not normalized:
+            return None
+        return agent_id, normalized
+
+    def get(self, key: Tuple[str, str]) -> Optional[str]:
+        """Ответ из кэша или None при промахе"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[2] < time.monotonic():
+            self._remove(key)
+            self.expired += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key: Tuple[str, str], response: str) -> None:
+        """Сохранить ответ, вытеснив давно не использованные записи при превышении объема"""
+        size = len(key[0]) + len(key[1].encode('utf-8')) + len(response.encode('utf-8')) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (response, size, time.monotonic() + self.ttl)
+        self.size_bytes += size
+
+        while self.size_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.size_bytes -= size
+
+    def clear(self) -> None:
+        """Очистить кэш"""
+        self._entries.clear()
+        self.size_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Объем кэша и доля попаданий"""
+        total = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'size': len(self._entries),
+            'size_bytes': self.size_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expired': self.expired,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+# Создаем экземпляр для использования в других модулях
+response_cache = ResponseCache()
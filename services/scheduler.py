@@ -0,0 +1,250 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict
+
+import config
+
+logger = logging.getLogger(__name__)
+
+class QueueFullError(Exception):
+    """Очередь запросов к AI агенту заполнена, запрос отклонен"""
+
+def request_priority(user) -> str:
+    """
+    Класс приоритета запросов пользователя: unlimited, paid или free.
+
+    Args:
+        user: User или UserSummary
+    """
+    if user.is_unlimited:
+        return 'unlimited'
+    if getattr(user, 'paid_tariff', None):
+        return 'paid'
+    return 'free'
+
+class PriorityLane:
+    """Очередь одного класса приоритета с отдельной очередью у каждого пользователя"""
+
+    def __init__(self, name: str, weight: int, wait_samples: int):
+        self.name = name
+        self.weight = weight
+        # Текущий вес для плавного взвешенного кругового выбора
+        self.current_weight = 0
+
+        self.queued = 0
+        self.queues: Dict[int, Deque[asyncio.Future]] = {}
+        self.ring: Deque[int] = deque()
+        self.rejected = 0
+        self.wait_times: Deque[float] = deque(maxlen=wait_samples)
+
+    def push(self, user_id: int, waiter: asyncio.Future) -> None:
+        if user_id not in self.queues:
+            self.queues[user_id] = deque()
+            self.ring.append(user_id)
+        self.queues[user_id].append(waiter)
+        self.queued += 1
+
+    def pop(self) -> asyncio.Future:
+        """Следующий запрос: пользователи этой очереди обслуживаются по кругу"""
+        user_id = self.ring.popleft()
+        queue = self.queues[user_id]
+        waiter = queue.popleft()
+        self.queued -= 1
+        if queue:
+            self.ring.append(user_id)
+        else:
+            del self.queues[user_id]
+        return waiter
+
+    def pop_newest(self) -> asyncio.Future:
+        """Последний запрос пользователя с самой длинной очередью (для вытеснения)"""
+        # При равной длине очереди выбирается пользователь, позже всех вставший в круг
+        user_id = max(reversed(self.ring), key=lambda queued_user: len(self.queues[queued_user]))
+        waiter = self.queues[user_id].pop()
+        self.queued -= 1
+        if not self.queues[user_id]:
+            del self.queues[user_id]
+            self.ring.remove(user_id)
+        return waiter
+
+    def remove(self, user_id: int, waiter: asyncio.Future) -> None:
+        queue = self.queues.get(user_id)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        self.queued -= 1
+        if not queue:
+            del self.queues[user_id]
+            self.ring.remove(user_id)
+
+class AIRequestScheduler:
+    """
+    Планировщик запросов к AI агенту.
+
+    Одновременно выполняется не больше max_concurrency запросов, остальные ждут
+    в очереди длиной не больше max_queue (при переполнении - QueueFullError).
+
+    Ожидающие запросы делятся на классы приоритета (unlimited, paid, free) с весами
+    из weights: освободившийся слот достается классу плавным взвешенным круговым выбором,
+    поэтому при перегрузке платящие пользователи ждут меньше, но бесплатные не голодают.
+    Внутри класса у каждого пользователя своя очередь, и пользователи обслуживаются
+    по кругу. При заполненной очереди запрос более высокого класса вытесняет
+    последний запрос самого низкого класса.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = config.AI_MAX_CONCURRENCY,
+        max_queue: int = config.AI_QUEUE_SIZE,
+        weights: Dict[str, int] = config.AI_PRIORITY_WEIGHTS,
+        wait_samples: int = 1000
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+
+        self.active = 0
+        self.queued = 0
+        # Классы в порядке убывания веса
+        self.lanes: Dict[str, PriorityLane] = {
+            name: PriorityLane(name, weight, wait_samples)
+            for name, weight in sorted(weights.items(), key=lambda item: -item[1])
+        }
+        self.lowest_lane = list(self.lanes)[-1]
+
+        # Метрики
+        self.completed = 0
+        self.rejected = 0
+        self.max_queued = 0
+        self.wait_times: Deque[float] = deque(maxlen=wait_samples)
+
+    async def run(
+        self,
+        user_id: int,
+        func: Callable[..., Awaitable[Any]],
+        /,
+        *args,
+        priority: str = 'free',
+        **kwargs
+    ) -> Any:
+        """
+        Выполнить func(*args, **kwargs), дождавшись своей очереди в классе priority.
+        user_id и func только позиционные, чтобы user_id можно было передать и в func.
+        """
+        await self.acquire(user_id, priority)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            self.release()
+
+    async def acquire(self, user_id: int, priority: str = 'free') -> None:
+        """Занять слот выполнения; при заполненной очереди - QueueFullError"""
+        lane = self.lanes.get(priority) or self.lanes[self.lowest_lane]
+
+        if self.active < self.max_concurrency and not self.queued:
+            self.active += 1
+            self._record_wait(lane, 0.0)
+            return
+
+        if self.queued >= self.max_queue and not self._evict_lower(lane):
+            self.rejected += 1
+            lane.rejected += 1
+            logger.warning(
+                f"Очередь AI запросов заполнена ({self.queued}), "
+                f"запрос пользователя {user_id} ({lane.name}) отклонен"
+            )
+            raise QueueFullError(f"Очередь заполнена: {self.queued}")
+
+        waiter = asyncio.get_running_loop().create_future()
+        lane.push(user_id, waiter)
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+
+        started = time.monotonic()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                # Слот уже выдан, но запрос отменен - возвращаем слот.
+                # Вытесненный запрос (QueueFullError) слота не получал
+                self.release()
+            elif waiter in lane.queues.get(user_id, ()):
+                lane.remove(user_id, waiter)
+                self.queued -= 1
+            raise
+        self._record_wait(lane, time.monotonic() - started)
+
+    def release(self) -> None:
+        """Освободить слот и передать его следующему запросу"""
+        self.active -= 1
+        self.completed += 1
+        while self.active < self.max_concurrency and self.queued:
+            waiter = self._next_lane().pop()
+            self.queued -= 1
+            self.active += 1
+            waiter.set_result(None)
+
+    def _next_lane(self) -> PriorityLane:
+        """Плавный взвешенный круговой выбор среди непустых классов (как в nginx)"""
+        candidates = [lane for lane in self.lanes.values() if lane.queued]
+        total = sum(lane.weight for lane in candidates)
+        for lane in candidates:
+            lane.current_weight += lane.weight
+        selected = max(candidates, key=lambda lane: lane.current_weight)
+        selected.current_weight -= total
+        return selected
+
+    def _evict_lower(self, lane: PriorityLane) -> bool:
+        """Вытеснить запрос самого низкого класса ниже lane, чтобы освободить место"""
+        for candidate in reversed(list(self.lanes.values())):
+            if candidate.weight >= lane.weight:
+                return False
+            if candidate.queued:
+                waiter = candidate.pop_newest()
+                self.queued -= 1
+                self.rejected += 1
+                candidate.rejected += 1
+                waiter.set_exception(QueueFullError("Запрос вытеснен запросом с более высоким приоритетом"))
+                logger.warning(f"Запрос класса {candidate.name} вытеснен из очереди запросом класса {lane.name}")
+                return True
+        return False
+
+    def _record_wait(self, lane: PriorityLane, wait: float) -> None:
+        self.wait_times.append(wait)
+        lane.wait_times.append(wait)
+
+    @staticmethod
+    def _wait_stats(wait_times: Deque[float]) -> Dict[str, float]:
+        waits = sorted(wait_times)
+        return {
+            'wait_avg': sum(waits) / len(waits) if waits else 0.0,
+            'wait_p95': waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0,
+            'wait_max': waits[-1] if waits else 0.0
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Глубина очереди, время ожидания и счетчики планировщика, в том числе по классам"""
+        return {
+            'active': self.active,
+            'max_concurrency': self.max_concurrency,
+            'queued': self.queued,
+            'max_queued': self.max_queued,
+            'max_queue': self.max_queue,
+            'waiting_users': sum(len(lane.queues) for lane in self.lanes.values()),
+            'completed': self.completed,
+            'rejected': self.rejected,
+            **self._wait_stats(self.wait_times),
+            'lanes': {
+                name: {
+                    'weight': lane.weight,
+                    'queued': lane.queued,
+                    'rejected': lane.rejected,
+                    **self._wait_stats(lane.wait_times)
+                }
+                for name, lane in self.lanes.items()
+            }
+        }
+
+# Создаем экземпляр для использования в других модулях
+ai_scheduler = AIRequestScheduler()
@@ -0,0 +1,185 @@
+import logging
+import sys
+import zlib
+from collections import Counter
+from typing import List, Optional, Sequence, Tuple
+
+from services.response_cache import normalize_prompt
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+    logger.warning("NumPy не установлен, поиск по старым сообщениям отключен")
+
+# Число корзин частот документов (общих для всех пользователей), степень двойки
+DF_BITS = 18
+DF_MASK = (1 << DF_BITS) - 1
+
+# Размер кортежа (роль, текст) и ссылки на него в списке
+TEXT_OVERHEAD = sys.getsizeof(('', '')) + 8
+
+# Длина символьных n-грамм: устойчивы к окончаниям (тревожно / тревога / тревожусь)
+NGRAM = 3
+
+def extract_features(text: str) -> Counter:
+    """Хэши признаков текста (слова и символьные n-граммы слов) с числом вхождений"""
+    features = Counter()
+    for word in normalize_prompt(text).split():
+        features[zlib.crc32(b'w' + word.encode('utf-8'))] += 1
+        padded = f' {word} '
+        for start in range(max(1, len(padded) - NGRAM + 1)):
+            features[zlib.crc32(padded[start:start + NGRAM].encode('utf-8'))] += 1
+    return features
+
+class DocumentFrequencies:
+    """
+    Частоты признаков по всем проиндексированным сообщениям для весов IDF.
+
+    Признаки хэшируются в 2**DF_BITS корзин, поэтому объем не зависит от словаря.
+    """
+
+    def __init__(self):
+        self.counts = np.zeros(1 << DF_BITS, dtype=np.int32) if HAS_NUMPY else None
+        self.documents = 0
+
+    def add(self, hashes: "np.ndarray") -> None:
+        self.counts[np.unique(hashes & DF_MASK)] += 1
+        self.documents += 1
+
+    def idf(self, hashes: "np.ndarray") -> "np.ndarray":
+        df = self.counts[hashes & DF_MASK]
+        return np.log((1 + self.documents) / (1 + df)).astype(np.float32) + 1
+
+class SemanticIndex:
+    """
+    Векторный индекс сообщений одного пользователя.
+
+    Сообщение превращается в хэшированный TF-IDF вектор размерности dim: каждый признак
+    попадает в координату по своему хэшу со знаком +-1 (hashing trick), вес признака -
+    (1 + log tf) * idf, вектор нормируется. Векторы хранятся строками одной матрицы float32,
+    поэтому косинусная близость ко всем сообщениям - одно матричное умножение,
+    а top-k выбирается argpartition без полной сортировки.
+
+    При заполнении до max_size удаляется самая старая четверть сообщений.
+    """
+
+    def __init__(self, frequencies: DocumentFrequencies, dim: int = 256, max_size: int = 2000):
+        self.frequencies = frequencies
+        self.dim = dim
+        self.max_size = max_size
+        self.vectors = np.zeros((16, dim), dtype=np.float32)
+        self.texts: List[Tuple[str, str]] = []
+        self.text_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @property
+    def nbytes(self) -> int:
+        """Оценка памяти индекса: матрица векторов и тексты сообщений"""
+        return self.vectors.nbytes + self.text_bytes
+
+    @staticmethod
+    def _text_size(content: str) -> int:
+        return TEXT_OVERHEAD + sys.getsizeof(content)
+
+    def embed(self, text: str, count_document: bool = False) -> Optional["np.ndarray"]:
+        """Нормированный вектор текста или None, если в тексте нет слов"""
+        features = extract_features(text)
+        if not features:
+            return None
+        hashes = np.fromiter(features.keys(), dtype=np.uint32, count=len(features))
+        tf = np.fromiter(features.values(), dtype=np.float32, count=len(features))
+        if count_document:
+            self.frequencies.add(hashes)
+
+        weights = (1 + np.log(tf)) * self.frequencies.idf(hashes)
+        # Старшие биты хэша (не использованные для корзины частот) дают координату и знак
+        signs = np.where((hashes >> 31) & 1, -1.0, 1.0)
+        dims = (hashes >> DF_BITS) % self.dim
+        vector = np.bincount(dims, weights=weights * signs, minlength=self.dim).astype(np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else None
+
+    def add(self, role: str, content: str, count_document: bool = True) -> None:
+        """
+        Проиндексировать сообщение
+
+        Args:
+            count_document: Учитывать ли сообщение в частотах IDF
+                (не нужно для сообщений, повторно загружаемых из базы)
+        """
+        vector = self.embed(content, count_document)
+        if len(self.texts) >= self.max_size:
+            drop = self.max_size // 4
+            size = len(self.texts)
+            self.vectors[:size - drop] = self.vectors[drop:size]
+            self.text_bytes -= sum(self._text_size(text) for _, text in self.texts[:drop])
+            del self.texts[:drop]
+
+        size = len(self.texts)
+        if size == len(self.vectors):
+            capacity = min(self.max_size, size + size // 2)
+            grown = np.zeros((capacity, self.dim), dtype=np.float32)
+            grown[:size] = self.vectors[:size]
+            self.vectors = grown
+        self.vectors[size] = vector if vector is not None else 0.0
+        self.texts.append((role, content))
+        self.text_bytes += self._text_size(content)
+
+    def search(
+        self,
+        queries: Sequence[str],
+        k: int,
+        min_score: float = 0.0,
+        exclude_last: int = 0
+    ) -> List[List[Tuple[float, int]]]:
+        """
+        Найти для каждого запроса k самых близких сообщений
+
+        Args:
+            queries: Тексты запросов (обрабатываются одним умножением матриц)
+            k: Сколько сообщений вернуть на запрос
+            min_score: Минимальная косинусная близость
+            exclude_last: Сколько последних сообщений не искать (они уже в контексте)
+
+        Returns:
+            List[List[Tuple[float, int]]]: Для каждого запроса пары (близость, номер сообщения)
+                по убыванию близости
+        """
+        size = len(self.texts) - exclude_last
+        results: List[List[Tuple[float, int]]] = [[] for _ in queries]
+        if size <= 0 or k <= 0:
+            return results
+
+        embedded = [(position, self.embed(query)) for position, query in enumerate(queries)]
+        embedded = [(position, vector) for position, vector in embedded if vector is not None]
+        if not embedded:
+            return results
+
+        query_matrix = np.stack([vector for _, vector in embedded])
+        scores = self.vectors[:size] @ query_matrix.T
+        k = min(k, size)
+        if k < size:
+            top = np.argpartition(-scores, k - 1, axis=0)[:k]
+        else:
+            top = np.broadcast_to(np.arange(size)[:, None], (size, len(embedded)))
+
+        for column, (position, _) in enumerate(embedded):
+            indices = top[:, column]
+            column_scores = scores[indices, column]
+            order = np.argsort(-column_scores)
+            results[position] = [
+                (float(column_scores[i]), int(indices[i]))
+                for i in order
+                if column_scores[i] >= min_score
+            ]
+        return results
+
+# Частоты признаков общие для всех пользователей: так IDF точнее, чем по одному диалогу
+document_frequencies = DocumentFrequencies()
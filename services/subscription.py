@@ -4,7 +4,7 @@ from telegram import Bot
 from telegram.error import TelegramError
 
 import config
-from database import get_user, set_subscription_status
+from database import get_user_summary, set_subscription_status
 
 # Настраиваем логирование
 logger = logging.getLogger(__name__)
@@ -42,7 +42,7 @@ class SubscriptionService:
             logger.info(f"Статус подписки пользователя {user_id}: {status}, подписан: {is_subscribed}")
             
             # Обновляем статус в базе данных
-            user = await get_user(user_id)
+            user = await get_user_summary(user_id)
             if user and user.is_subscribed != is_subscribed:
                 await set_subscription_status(user_id, is_subscribed)
                 logger.info(f"Обновлен статус подписки для пользователя {user_id}: {is_subscribed}")
@@ -0,0 +1,47 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+logger = logging.getLogger(__name__)
+
+class UserLocks:
+    """
+    Блокировки для поочередной обработки сообщений одного пользователя.
+
+    Сообщения чата обрабатываются параллельно (block=False), но проверка баланса, запрос к агенту
+    и списание токенов для сообщений одного пользователя должны идти строго по очереди.
+    asyncio.Lock пропускает ожидающих в порядке вызова acquire, поэтому сообщения,
+    вставшие в очередь в порядке прихода, обрабатываются в том же порядке.
+    Блокировка удаляется, когда ее никто не держит и не ждет, так что объем
+    не растет с числом пользователей.
+    """
+
+    def __init__(self):
+        self._locks: Dict[int, asyncio.Lock] = {}
+        # Сколько обработчиков держат или ждут блокировку пользователя
+        self._holders: Dict[int, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, user_id: int) -> AsyncIterator[None]:
+        """Выполнить блок, когда закончится обработка предыдущих сообщений пользователя"""
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = self._locks[user_id] = asyncio.Lock()
+        self._holders[user_id] = self._holders.get(user_id, 0) + 1
+        try:
+            if lock.locked():
+                logger.debug(f"Сообщение пользователя {user_id} ждет окончания обработки предыдущего")
+            async with lock:
+                yield
+        finally:
+            self._holders[user_id] -= 1
+            if not self._holders[user_id]:
+                del self._holders[user_id]
+                del self._locks[user_id]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+# Создаем экземпляр для использования в других модулях
+user_locks = UserLocks()
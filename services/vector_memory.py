@@ -1,20 +1,184 @@
+import asyncio
 import logging
 import json
-from typing import Dict, List, Optional, Any
+import sys
+import time
+from collections import OrderedDict, deque
+from collections.abc import Sequence
+from typing import Deque, Dict, Iterator, List, NamedTuple, Optional, Any, Set
+
+import config
+from database import get_chat_history, load_memory_contexts, save_memory_contexts
+from services.semantic_index import HAS_NUMPY, SemanticIndex, document_frequencies
 
 logger = logging.getLogger(__name__)
 
+# Максимум сообщений в контексте одного пользователя
+MAX_MESSAGES = 20
+
+class MemoryEntry(NamedTuple):
+    """Сообщение контекста: кортеж без словаря атрибутов и повторяющихся ключей"""
+    role: str
+    content: str
+
+# Размер кортежа сообщения без текста (строки ролей общие для всех сообщений)
+MESSAGE_OVERHEAD = sys.getsizeof(MemoryEntry("", ""))
+
+def message_size(content: str) -> int:
+    """Оценка памяти, занимаемой одним сообщением контекста"""
+    return MESSAGE_OVERHEAD + sys.getsizeof(content)
+
+class MemoryView(Sequence):
+    """
+    Представление контекста пользователя только для чтения.
+    
+    Не копирует сообщения: обращается к кольцевому буферу пользователя напрямую,
+    поэтому видит и сообщения, добавленные после своего создания.
+    """
+    
+    __slots__ = ('_entries',)
+    
+    def __init__(self, entries: Deque[MemoryEntry]):
+        self._entries = entries
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self._entries)[index]
+        return self._entries[index]
+    
+    def __iter__(self) -> Iterator[MemoryEntry]:
+        return iter(self._entries)
+    
+    def __repr__(self) -> str:
+        return f"MemoryView({list(self._entries)!r})"
+    
+    def as_dicts(self) -> List[Dict[str, str]]:
+        """Сообщения в формате [{role: "user"/"assistant", content: "текст"}]"""
+        return [entry._asdict() for entry in self._entries]
+
 class VectorMemoryService:
     """
     Сервис для работы с векторной памятью агента.
     Обеспечивает сохранение и извлечение контекста диалога для каждого пользователя.
+    
+    Память всех пользователей ограничена общим бюджетом max_bytes / max_messages.
+    При его превышении вытесняются контексты давно не писавших пользователей (LRU),
+    а при следующем обращении контекст лениво восстанавливается из истории сообщений в базе.
+    
+    С включенным поиском (retrieval) у каждого пользователя есть еще векторный индекс
+    последних index_size сообщений (SemanticIndex), по которому search находит старые
+    сообщения, похожие на новый вопрос. Индекс входит в тот же бюджет памяти, вытесняется
+    вместе с контекстом и восстанавливается из истории в базе. Очистка памяти очищает
+    только текущий контекст: индекс - долговременная память о пользователе.
+    
+    Сами сообщения уже хранятся в истории в базе, поэтому для восстановления после
+    перезапуска достаточно знать размер текущего контекста каждого пользователя.
+    Изменившиеся размеры периодически сохраняются (save_snapshot), при запуске
+    загружаются одним запросом (restore_snapshot), а контексты восстанавливаются
+    из истории лениво, как после вытеснения.
     """
     
-    def __init__(self):
-        self.user_memories = {}  # Словарь для хранения контекста диалогов по user_id
-        logger.info("Инициализирован сервис векторной памяти")
+    def __init__(
+        self,
+        max_bytes: int = config.VECTOR_MEMORY_MAX_BYTES,
+        max_messages: int = config.VECTOR_MEMORY_MAX_MESSAGES,
+        retrieval: bool = config.VECTOR_MEMORY_RETRIEVAL,
+        index_size: int = config.VECTOR_MEMORY_INDEX_SIZE
+    ):
+        self.max_bytes = max_bytes
+        self.max_messages = max_messages
+        self.retrieval = retrieval and HAS_NUMPY
+        self.index_size = index_size
+        if retrieval and not HAS_NUMPY:
+            logger.warning("Поиск по старым сообщениям включен, но NumPy не установлен: поиск отключен")
+        
+        # Контексты диалогов по user_id (кольцевые буферы на MAX_MESSAGES сообщений),
+        # от давно не использованных к недавним
+        self.user_memories: "OrderedDict[int, Deque[MemoryEntry]]" = OrderedDict()
+        self.user_indexes: Dict[int, SemanticIndex] = {}
+        self.user_sizes: Dict[int, int] = {}
+        self.total_bytes = 0
+        self.total_messages = 0
+        
+        # Сколько сообщений было в контексте вытесненного (или сохраненного до перезапуска)
+        # пользователя: столько и восстанавливается из базы, чтобы не вернуть сообщения,
+        # удаленные из контекста очисткой памяти.
+        # Хранится не больше max_messages записей, самые старые забываются
+        self.evicted: "OrderedDict[int, int]" = OrderedDict()
+        
+        # Пользователи, размер контекста которых изменился после последнего сохранения
+        self.dirty: Set[int] = set()
+        
+        # Метрики
+        self.evictions = 0
+        self.rehydrations = 0
+        logger.info(f"Инициализирован сервис векторной памяти: {max_bytes} байт, {max_messages} сообщений")
+    
+    async def _load(self, user_id: int) -> Deque[MemoryEntry]:
+        """Контекст пользователя; вытесненный контекст восстанавливается из истории в базе"""
+        memory = self.user_memories.get(user_id)
+        if memory is not None:
+            self.user_memories.move_to_end(user_id)
+            return memory
+        
+        messages: Deque[MemoryEntry] = deque(maxlen=MAX_MESSAGES)
+        index = self._create_index()
+        count = self.evicted.pop(user_id, 0)
+        if count or index is not None:
+            try:
+                history = await get_chat_history(user_id, limit=self.index_size if index is not None else count)
+                entries = [
+                    MemoryEntry("user" if message.is_user else "assistant", message.text)
+                    for message in history
+                ]
+                if count:
+                    messages.extend(entries[-count:])
+                if index is not None:
+                    for entry in entries:
+                        index.add(entry.role, entry.content, count_document=False)
+                if entries:
+                    self.rehydrations += 1
+                    logger.debug(f"Контекст пользователя {user_id} восстановлен из базы: {len(entries)} сообщений")
+            except Exception as e:
+                logger.error(f"Не удалось восстановить контекст пользователя {user_id}: {str(e)}")
+            
+            # Пока шел запрос к базе, контекст мог появиться снова
+            memory = self.user_memories.get(user_id)
+            if memory is not None:
+                self.user_memories.move_to_end(user_id)
+                return memory
+        
+        self.user_memories[user_id] = messages
+        size = sum(message_size(message.content) for message in messages)
+        if index is not None:
+            self.user_indexes[user_id] = index
+            size += index.nbytes
+        self.user_sizes[user_id] = size
+        self.total_bytes += size
+        self.total_messages += len(messages)
+        self._evict()
+        return messages
+    
+    def _evict(self) -> None:
+        """Вытеснить давно не использованные контексты, пока память превышает бюджет"""
+        # Последний (текущий) пользователь не вытесняется, даже если один превышает бюджет
+        while len(self.user_memories) > 1 and (
+            self.total_bytes > self.max_bytes or self.total_messages > self.max_messages
+        ):
+            user_id, memory = self.user_memories.popitem(last=False)
+            self.total_bytes -= self.user_sizes.pop(user_id)
+            self.total_messages -= len(memory)
+            self.user_indexes.pop(user_id, None)
+            if memory:
+                self.evicted[user_id] = len(memory)
+                if len(self.evicted) > self.max_messages:
+                    self.evicted.popitem(last=False)
+            self.evictions += 1
     
-    async def get_memory(self, user_id: int) -> List[Dict[str, str]]:
+    async def get_memory(self, user_id: int) -> MemoryView:
         """
         Получает текущий контекст диалога для пользователя
         
@@ -22,12 +186,9 @@ class VectorMemoryService:
             user_id: ID пользователя
             
         Returns:
-            List[Dict[str, str]]: Список сообщений диалога в формате [{role: "user"/"assistant", content: "текст"}]
+            MemoryView: Сообщения диалога (MemoryEntry с полями role и content) без копирования
         """
-        if user_id not in self.user_memories:
-            self.user_memories[user_id] = []
-        
-        return self.user_memories[user_id]
+        return MemoryView(await self._load(user_id))
     
     async def add_message(self, user_id: int, role: str, content: str) -> None:
         """
@@ -38,18 +199,27 @@ class VectorMemoryService:
             role: Роль отправителя (user/assistant)
             content: Текст сообщения
         """
-        if user_id not in self.user_memories:
-            self.user_memories[user_id] = []
+        memory = await self._load(user_id)
+        
+        size = message_size(content)
         
-        # Добавляем сообщение в историю
-        self.user_memories[user_id].append({
-            "role": role,
-            "content": content
-        })
+        # Буфер ограничен MAX_MESSAGES: при добавлении самое старое сообщение вытесняется
+        if len(memory) == memory.maxlen:
+            size -= message_size(memory[0].content)
+            self.total_messages -= 1
+        memory.append(MemoryEntry(role, content))
         
-        # Ограничиваем длину истории, чтобы избежать переполнения контекста
-        if len(self.user_memories[user_id]) > 20:
-            self.user_memories[user_id] = self.user_memories[user_id][-20:]
+        index = self.user_indexes.get(user_id)
+        if index is not None:
+            index_bytes = index.nbytes
+            index.add(role, content)
+            size += index.nbytes - index_bytes
+        
+        self.user_sizes[user_id] += size
+        self.total_bytes += size
+        self.total_messages += 1
+        self.dirty.add(user_id)
+        self._evict()
         
         logger.debug(f"Добавлено сообщение в память пользователя {user_id}: {role}: {content[:30]}...")
     
@@ -60,9 +230,111 @@ class VectorMemoryService:
         Args:
             user_id: ID пользователя
         """
-        self.user_memories[user_id] = []
+        memory = self.user_memories.get(user_id)
+        if memory is not None:
+            freed = sum(message_size(message.content) for message in memory)
+            self.user_sizes[user_id] -= freed
+            self.total_bytes -= freed
+            self.total_messages -= len(memory)
+            memory.clear()
+        self.evicted.pop(user_id, None)
+        self.dirty.add(user_id)
         logger.info(f"Очищена память пользователя {user_id}")
     
+    def _context_size(self, user_id: int) -> int:
+        memory = self.user_memories.get(user_id)
+        return len(memory) if memory is not None else self.evicted.get(user_id, 0)
+    
+    async def save_snapshot(self) -> int:
+        """
+        Сохранить размеры изменившихся контекстов
+        
+        Returns:
+            int: Сколько пользователей сохранено
+        """
+        if not self.dirty:
+            return 0
+        users, self.dirty = self.dirty, set()
+        try:
+            await save_memory_contexts({user_id: self._context_size(user_id) for user_id in users})
+        except Exception:
+            # Сохраним при следующей попытке
+            self.dirty |= users
+            raise
+        return len(users)
+    
+    async def restore_snapshot(self) -> int:
+        """
+        Загрузить сохраненные размеры контекстов после перезапуска.
+        Контексты восстанавливаются из истории в базе при первом обращении пользователя.
+        
+        Returns:
+            int: Сколько контекстов можно восстановить
+        """
+        started = time.monotonic()
+        contexts = await load_memory_contexts()
+        # Записи идут от давно обновленных к недавним - тот же порядок, что у вытеснения
+        for user_id, size in contexts[-self.max_messages:]:
+            if user_id not in self.user_memories:
+                self.evicted[user_id] = size
+        logger.info(
+            f"Загружено {len(contexts)} сохраненных контекстов памяти за {time.monotonic() - started:.2f} с"
+        )
+        return len(contexts)
+    
+    async def snapshot_loop(self, interval: float = config.VECTOR_MEMORY_SNAPSHOT_INTERVAL) -> None:
+        """Периодически сохранять изменившиеся контексты (фоновая задача бота)"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.save_snapshot()
+            except Exception as e:
+                logger.error(f"Ошибка при сохранении памяти диалогов: {str(e)}")
+    
+    def _create_index(self) -> Optional[SemanticIndex]:
+        if not self.retrieval:
+            return None
+        return SemanticIndex(document_frequencies, dim=config.VECTOR_MEMORY_DIM, max_size=self.index_size)
+    
+    async def search(self, user_id: int, text: str, k: int = config.VECTOR_MEMORY_TOP_K) -> List[MemoryEntry]:
+        """
+        Найти старые сообщения пользователя, близкие по смыслу к тексту
+        
+        Сообщения текущего контекста не возвращаются: они и так известны агенту.
+        
+        Args:
+            user_id: ID пользователя
+            text: Текст, для которого ищутся похожие сообщения
+            k: Максимум сообщений
+            
+        Returns:
+            List[MemoryEntry]: Сообщения по убыванию близости (пустой список, если поиск отключен)
+        """
+        if not self.retrieval:
+            return []
+        memory = await self._load(user_id)
+        index = self.user_indexes.get(user_id)
+        if index is None:
+            return []
+        
+        matches = index.search([text], k, config.VECTOR_MEMORY_MIN_SCORE, exclude_last=len(memory))[0]
+        return [MemoryEntry(*index.texts[position]) for _, position in matches]
+    
+    def stats(self) -> Dict[str, Any]:
+        """Текущий объем памяти и счетчики вытеснения"""
+        return {
+            'users': len(self.user_memories),
+            'messages': self.total_messages,
+            'max_messages': self.max_messages,
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'indexed_messages': sum(len(index) for index in self.user_indexes.values()),
+            'evicted_users': len(self.evicted),
+            'unsaved_users': len(self.dirty),
+            'evictions': self.evictions,
+            'rehydrations': self.rehydrations
+        }
+    
     async def prepare_context_for_agent(self, user_id: int) -> str:
         """
         Подготавливает контекст в формате, подходящем для отправки AI агенту
@@ -74,7 +346,7 @@ class VectorMemoryService:
             str: JSON-строка с контекстом диалога
         """
         memory = await self.get_memory(user_id)
-        return json.dumps({"messages": memory})
+        return json.dumps({"messages": memory.as_dicts()})
     
     async def extract_agent_response(self, agent_response: Dict[str, Any]) -> str:
         """
@@ -0,0 +1,29 @@
+import os
+import sys
+
+# config.py требует ADMIN_IDS при импорте; тесты работают без MongoDB
+os.environ.setdefault('ADMIN_IDS', '1')
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from database import operations
+from database.cache import user_cache
+from database.storage_memory import InMemoryStorage
+from database.storage_sqlite import SQLiteStorage
+
+BACKENDS = {
+    'memory': InMemoryStorage,
+    'sqlite': lambda: SQLiteStorage(':memory:'),
+}
+
+@pytest.fixture(params=list(BACKENDS))
+def storage(request, monkeypatch):
+    """Локальное хранилище вместо MongoDB и пустой кэш пользователей"""
+    backend = BACKENDS[request.param]()
+    monkeypatch.setattr(operations, 'storage', backend)
+    user_cache.clear()
+    yield backend
+    user_cache.clear()
@@ -0,0 +1,87 @@
+import asyncio
+from types import SimpleNamespace
+
+import config
+from database.models import User
+from handlers import chat
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_chat_action(self, chat_id, action):
+        pass
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        self.sent.append(text)
+        return SimpleNamespace(chat_id=chat_id, text=text)
+
+class FakeAgent:
+    """Агент, который отвечает на первое сообщение дольше, чем на второе"""
+
+    def __init__(self):
+        self.calls = []
+
+    def is_available(self):
+        return True
+
+    async def send_message(self, message, user_id=None, stream=False, on_chunk=None):
+        self.calls.append(message)
+        await asyncio.sleep(0.05 if len(self.calls) == 1 else 0.0)
+        return f"ответ на {message}"
+
+def _update(user_id: int, text: str):
+    return SimpleNamespace(
+        message=SimpleNamespace(text=text),
+        effective_user=SimpleNamespace(id=user_id),
+        effective_chat=SimpleNamespace(id=user_id)
+    )
+
+async def _send_concurrently(storage, user: User, texts):
+    await storage.insert_user(user.to_dict())
+    bot = FakeBot()
+    context = SimpleNamespace(bot=bot, user_data={})
+    await asyncio.gather(*(chat.handle_message(_update(user.user_id, text), context) for text in texts))
+    return bot.sent, await storage.find_user(user.user_id)
+
+def test_messages_of_one_user_are_answered_in_order(storage, monkeypatch):
+    agent = FakeAgent()
+    monkeypatch.setattr(chat, 'ai_service', agent)
+    user = User(user_id=7, tokens=config.TOKENS_PER_MESSAGE * 2)
+
+    sent, stored = asyncio.run(_send_concurrently(storage, user, ['первое', 'второе']))
+
+    assert agent.calls == ['первое', 'второе']
+    assert [text.split('\n')[0] for text in sent] == ['ответ на первое', 'ответ на второе']
+    assert stored['tokens'] == 0
+
+def test_balance_is_checked_after_previous_message(storage, monkeypatch):
+    agent = FakeAgent()
+    monkeypatch.setattr(chat, 'ai_service', agent)
+    user = User(user_id=8, tokens=config.TOKENS_PER_MESSAGE)
+
+    sent, stored = asyncio.run(_send_concurrently(storage, user, ['первое', 'второе']))
+
+    # На второе сообщение токенов уже нет: агент не вызывается, ответ не выдается
+    assert agent.calls == ['первое']
+    assert sent[0].startswith('ответ на первое')
+    assert 'недостаточно' in sent[1]
+    assert stored['tokens'] == 0
+
+def test_answer_is_not_delivered_when_deduction_fails(storage, monkeypatch):
+    class SpendingAgent(FakeAgent):
+        """Пока агент отвечает, баланс обнуляется (например, администратором)"""
+
+        async def send_message(self, message, user_id=None, stream=False, on_chunk=None):
+            await storage.update_user(user_id, {'$set': {'tokens': 0}})
+            return await super().send_message(message, user_id, stream, on_chunk)
+
+    monkeypatch.setattr(chat, 'ai_service', SpendingAgent())
+    user = User(user_id=9, tokens=config.TOKENS_PER_MESSAGE)
+
+    sent, stored = asyncio.run(_send_concurrently(storage, user, ['вопрос']))
+
+    assert len(sent) == 1
+    assert 'ответ на вопрос' not in sent[0]
+    assert 'недостаточно' in sent[0]
+    assert stored['tokens'] == 0
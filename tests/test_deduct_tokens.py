@@ -0,0 +1,29 @@
+import asyncio
+
+from database import operations
+from database.models import User
+
+async def _deduct_in_parallel(storage, user: User, attempts: int, tokens: int = 1):
+    await storage.insert_user(user.to_dict())
+    results = await asyncio.gather(*(
+        operations.deduct_tokens(user.user_id, tokens) for _ in range(attempts)
+    ))
+    return [result for result in results if result is not None], await storage.find_user(user.user_id)
+
+def test_parallel_deductions_never_overdraw(storage):
+    succeeded, stored = asyncio.run(_deduct_in_parallel(storage, User(user_id=1, tokens=1000), attempts=1500))
+
+    assert len(succeeded) == 1000
+    assert stored['tokens'] == 0
+    # Каждое успешное списание видело свой баланс, без повторов
+    assert sorted(result.tokens for result in succeeded) == list(range(1000))
+
+def test_parallel_deductions_for_unlimited_user(storage):
+    user = User(user_id=2, tokens=5, is_unlimited=True)
+    succeeded, stored = asyncio.run(_deduct_in_parallel(storage, user, attempts=1000, tokens=10))
+
+    assert len(succeeded) == 1000
+    assert stored['tokens'] == 5
+
+def test_deduction_fails_for_missing_user(storage):
+    assert asyncio.run(operations.deduct_tokens(404, 10)) is None
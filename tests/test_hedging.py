@@ -0,0 +1,70 @@
+import asyncio
+from typing import List
+
+import pytest
+from aiohttp import web
+
+import config
+from services.ai_agent import AIAgent
+
+@pytest.fixture(autouse=True)
+def hedging(monkeypatch):
+    monkeypatch.setattr(config, 'AI_HEDGING', True)
+    monkeypatch.setattr(config, 'AI_HEDGE_MIN_SAMPLES', 0)
+    monkeypatch.setattr(config, 'AI_HEDGE_MIN_DELAY', 0.05)
+
+async def _serve(delays: List[float]):
+    """Серверы с заданной задержкой ответа; возвращает адреса и полученные запросы"""
+    received = [[] for _ in delays]
+    runners = []
+    urls = []
+    for position, delay in enumerate(delays):
+        async def handle(request, position=position, delay=delay):
+            received[position].append(await request.json())
+            await asyncio.sleep(delay)
+            return web.json_response({'response': f'ответ {position}'})
+
+        app = web.Application()
+        app.router.add_post('/', handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        runners.append(runner)
+        urls.append(f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/")
+    return urls, received, runners
+
+async def _send(delays: List[float], payload):
+    urls, received, runners = await _serve(delays)
+    agent = AIAgent(endpoints=[(url, 'agent') for url in urls])
+    agent.latency_samples.append(0.01)
+    agent.hedge_tokens = 5
+    try:
+        served, response = await agent._open(agent.endpoints[0], payload)
+        text = (await response.json())['response']
+        response.release()
+        await asyncio.sleep(0.1)
+        return text, [len(requests) for requests in received]
+    finally:
+        await agent.session.close()
+        for runner in runners:
+            await runner.cleanup()
+
+def test_user_requests_are_not_hedged_without_deduplication():
+    text, counts = asyncio.run(_send([0.3, 0.0], {'message': 'привет', 'user_id': '1'}))
+
+    assert text == 'ответ 0'
+    assert counts == [1, 0]
+
+def test_user_requests_are_hedged_when_api_deduplicates(monkeypatch):
+    monkeypatch.setattr(config, 'AI_AGENT_DEDUPLICATES', True)
+    text, counts = asyncio.run(_send([0.3, 0.0], {'message': 'привет', 'user_id': '1', 'request_id': 'r'}))
+
+    assert text == 'ответ 1'
+    assert counts == [1, 1]
+
+def test_request_is_never_hedged_to_the_same_endpoint():
+    text, counts = asyncio.run(_send([0.3], {'message': 'привет'}))
+
+    assert text == 'ответ 0'
+    assert counts == [1]
@@ -0,0 +1,37 @@
+import asyncio
+from datetime import timedelta
+
+from database import operations
+from database.models import Payment, User
+
+def _payment(payment_id: str, status: str) -> Payment:
+    return Payment(payment_id=payment_id, user_id=1, tariff='medium', amount=150, tokens=100, status=status)
+
+async def _create(storage, payment: Payment):
+    await storage.insert_user(User(user_id=1).to_dict())
+    return await operations.create_payment(payment)
+
+def test_payment_created_as_succeeded_is_counted(storage):
+    # Так сохраняет платеж Telegram Payments: сразу со статусом succeeded
+    payment = asyncio.run(_create(storage, _payment('telegram', 'succeeded')))
+
+    counters = asyncio.run(storage.get_counters())
+    assert counters.get('payments') == 1
+    assert counters.get('revenue') == 150
+    assert payment.completed_at is not None
+
+    hour = payment.completed_at.replace(minute=0, second=0, microsecond=0)
+    buckets = asyncio.run(storage.compute_hourly_metrics(hour, hour + timedelta(hours=1)))
+    assert buckets[0]['payments'] == {'medium': 1}
+    assert buckets[0]['revenue'] == {'medium': 150}
+
+def test_pending_payment_is_counted_once_on_success(storage):
+    asyncio.run(_create(storage, _payment('yookassa', 'pending')))
+    assert not asyncio.run(storage.get_counters()).get('payments')
+
+    asyncio.run(operations.update_payment_status('yookassa', 'succeeded'))
+    asyncio.run(operations.update_payment_status('yookassa', 'succeeded'))
+
+    counters = asyncio.run(storage.get_counters())
+    assert counters.get('payments') == 1
+    assert counters.get('revenue') == 150
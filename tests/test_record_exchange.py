@@ -0,0 +1,23 @@
+import asyncio
+
+from database import operations
+from database.models import User
+
+async def _record(storage, tokens: int):
+    await storage.insert_user(User(user_id=3, tokens=tokens).to_dict())
+    updated = await operations.record_exchange(3, 'вопрос', 'ответ', 10)
+    return updated, await storage.find_messages(3, 10), await storage.get_counters()
+
+def test_exchange_is_saved_after_deduction(storage):
+    updated, messages, counters = asyncio.run(_record(storage, tokens=10))
+
+    assert updated.tokens == 0
+    assert sorted(message['text'] for message in messages) == ['вопрос', 'ответ']
+    assert counters.get('messages') == 2
+
+def test_failed_deduction_saves_nothing(storage):
+    updated, messages, counters = asyncio.run(_record(storage, tokens=5))
+
+    assert updated is None
+    assert messages == []
+    assert not counters.get('messages')
@@ -0,0 +1,16 @@
+import asyncio
+
+from database import operations
+from database.models import Message
+from services.ai_agent import AIAgent
+from services.vector_memory import vector_memory_service
+
+def test_only_users_without_history_use_the_cache(storage):
+    async def scenario():
+        # Локальная память очищена (например, /start), но история в базе и в API агента осталась
+        await operations.add_messages_to_history([Message(user_id=21, text='привет', is_user=True)])
+        await vector_memory_service.clear_memory(21)
+        await vector_memory_service.add_message(22, 'user', 'привет')
+        return [await AIAgent._is_first_message(user_id) for user_id in (20, 21, 22, None)]
+
+    assert asyncio.run(scenario()) == [True, False, False, True]
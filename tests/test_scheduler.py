@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from services.scheduler import AIRequestScheduler, QueueFullError
+
+def _scheduler() -> AIRequestScheduler:
+    return AIRequestScheduler(max_concurrency=1, max_queue=1, weights={'paid': 2, 'free': 1})
+
+def test_cancelled_evicted_request_does_not_release_a_slot():
+    async def run():
+        scheduler = _scheduler()
+        await scheduler.acquire(1, 'free')
+        evicted = asyncio.create_task(scheduler.acquire(2, 'free'))
+        await asyncio.sleep(0)
+        paid = asyncio.create_task(scheduler.acquire(3, 'paid'))
+        await asyncio.sleep(0)
+        # Вытесненный запрос отменяется до того, как успел получить QueueFullError
+        evicted.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await evicted
+
+        # Слот по-прежнему у первого запроса, платный ждет
+        assert (scheduler.active, scheduler.queued) == (1, 1)
+        assert not paid.done()
+        scheduler.release()
+        await paid
+        assert (scheduler.active, scheduler.queued) == (1, 0)
+
+    asyncio.run(run())
+
+def test_evicted_request_gets_queue_full_error():
+    async def run():
+        scheduler = _scheduler()
+        await scheduler.acquire(1, 'free')
+        evicted = asyncio.create_task(scheduler.acquire(2, 'free'))
+        await asyncio.sleep(0)
+        paid = asyncio.create_task(scheduler.acquire(3, 'paid'))
+        with pytest.raises(QueueFullError):
+            await evicted
+        assert (scheduler.active, scheduler.queued) == (1, 1)
+        paid.cancel()
+
+    asyncio.run(run())
+
+def test_cancelled_request_returns_its_granted_slot():
+    async def run():
+        scheduler = _scheduler()
+        await scheduler.acquire(1, 'free')
+        waiting = asyncio.create_task(scheduler.acquire(2, 'free'))
+        await asyncio.sleep(0)
+        # Слот передан ожидающему, но его задача отменена до возобновления
+        scheduler.release()
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert (scheduler.active, scheduler.queued) == (0, 0)
+
+    asyncio.run(run())
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Локальный HTTP-сервер, имитирующий API AI агента (POST /api/message).
+
+Принимает тот же JSON, что и настоящий API ({agent_id, message, stream, user_id}),
+и отвечает {"response": "..."} либо потоком (SSE, NDJSON или простой текст), если stream=true.
+Задержка, доля ошибок и размер ответа настраиваются, поэтому с ним можно нагружать
+настоящий AIAgent (пул соединений, таймауты, повторы, хеджирование) без внешнего API.
+
+Сервер не импортирует модули бота (config, services), поэтому запускается без .env.
+
+Пример:
+    python -m utils.mock_ai_server --port 8081 --latency lognormal:0.8,0.6 --error-rate 0.02
+    AI_AGENT_URL=http://localhost:8081/api/message python main.py
+
+Распределения задержки:
+    fixed:S, uniform:A,B, normal:MU,SIGMA, lognormal:MEDIAN,SIGMA, exponential:MEAN (в секундах)
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import random
+import sys
+from typing import Any, Callable, Dict, Tuple
+
+from aiohttp import web
+
+from utils.mock_replies import choose_response
+
+logger = logging.getLogger('mock_ai_server')
+
+def parse_distribution(spec: str) -> Callable[[], float]:
+    """Построить генератор задержки в секундах по описанию вида name:arg1,arg2"""
+    name, _, args = spec.partition(':')
+    params = [float(value) for value in args.split(',') if value]
+
+    if name == 'fixed':
+        return lambda: params[0]
+    if name == 'uniform':
+        return lambda: random.uniform(params[0], params[1])
+    if name == 'normal':
+        return lambda: max(0.0, random.gauss(params[0], params[1]))
+    if name == 'lognormal':
+        # Параметр - медиана, а не среднее: так проще задавать типичную задержку
+        return lambda: random.lognormvariate(math.log(params[0]), params[1])
+    if name == 'exponential':
+        return lambda: random.expovariate(1 / params[0])
+    raise ValueError(f"Неизвестное распределение: {spec}")
+
+def parse_range(spec: str) -> Tuple[int, int]:
+    """Диапазон вида MIN:MAX или одно число"""
+    low, _, high = spec.partition(':')
+    return int(low), int(high or low)
+
+class MockAIServer:
+    """Обработчики запросов и счетчики имитации API"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.latency = parse_distribution(args.latency)
+        self.chunk_interval = parse_distribution(args.chunk_interval)
+        self.response_size = parse_range(args.response_size)
+        self.error_statuses = [int(status) for status in args.error_statuses.split(',')]
+        self.stats: Dict[str, int] = {'requests': 0, 'streams': 0, 'errors': 0, 'hangs': 0, 'in_flight': 0}
+
+    def build_response(self, message: str) -> str:
+        """Ответ в стиле MockAIAgent, дополненный до случайной длины из response_size"""
+        target = random.randint(*self.response_size)
+        parts = [choose_response(message)]
+        length = len(parts[0])
+        while length < target:
+            part = choose_response(message)
+            parts.append(part)
+            length += len(part) + 1
+        return ' '.join(parts)[:target]
+
+    async def handle_message(self, request: web.Request) -> web.StreamResponse:
+        self.stats['requests'] += 1
+        self.stats['in_flight'] += 1
+        try:
+            return await self._respond(request)
+        finally:
+            self.stats['in_flight'] -= 1
+
+    async def _respond(self, request: web.Request) -> web.StreamResponse:
+        try:
+            payload: Dict[str, Any] = await request.json()
+        except ValueError:
+            return web.json_response({'error': 'invalid json'}, status=400)
+        if not payload.get('message'):
+            return web.json_response({'error': 'message is required'}, status=400)
+
+        roll = random.random()
+        if roll < self.args.hang_rate:
+            # Зависший запрос: клиент должен отвалиться по таймауту
+            self.stats['hangs'] += 1
+            await asyncio.sleep(3600)
+        await asyncio.sleep(self.latency())
+        if roll < self.args.hang_rate + self.args.error_rate:
+            self.stats['errors'] += 1
+            status = random.choice(self.error_statuses)
+            return web.json_response({'error': 'simulated failure'}, status=status)
+
+        response_text = self.build_response(payload['message'])
+        if not payload.get('stream'):
+            return web.json_response({'response': response_text})
+
+        self.stats['streams'] += 1
+        return await self._stream(request, response_text)
+
+    async def _stream(self, request: web.Request, response_text: str) -> web.StreamResponse:
+        stream_format = self.args.stream_format
+        content_type = {
+            'sse': 'text/event-stream',
+            'ndjson': 'application/x-ndjson',
+            'text': 'text/plain'
+        }[stream_format]
+        response = web.StreamResponse(headers={'Content-Type': f'{content_type}; charset=utf-8'})
+        await response.prepare(request)
+
+        chunk_chars = self.args.chunk_chars
+        for start in range(0, len(response_text), chunk_chars):
+            chunk = response_text[start:start + chunk_chars]
+            if stream_format == 'sse':
+                data = f"data: {json.dumps({'delta': chunk}, ensure_ascii=False)}\n\n"
+            elif stream_format == 'ndjson':
+                data = json.dumps({'response': chunk}, ensure_ascii=False) + '\n'
+            else:
+                data = chunk
+            await response.write(data.encode('utf-8'))
+            await asyncio.sleep(self.chunk_interval())
+
+        if stream_format == 'sse':
+            await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+def create_app(args: argparse.Namespace) -> web.Application:
+    server = MockAIServer(args)
+    app = web.Application()
+    app.router.add_post(args.path, server.handle_message)
+    app.router.add_get('/stats', server.handle_stats)
+    return app
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Локальная имитация API AI агента")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--path', default='/api/message', help="Путь API")
+    parser.add_argument('--latency', default='lognormal:0.8,0.5',
+                        help="Распределение задержки до ответа (или до первого фрагмента потока)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Доля ответов с ошибкой")
+    parser.add_argument('--error-statuses', default='500,502,503,429', help="Коды ошибок через запятую")
+    parser.add_argument('--hang-rate', type=float, default=0.0, help="Доля запросов, на которые сервер не отвечает")
+    parser.add_argument('--response-size', default='200:1500', help="Длина ответа в символах MIN:MAX")
+    parser.add_argument('--stream-format', choices=('sse', 'ndjson', 'text'), default='sse',
+                        help="Формат потокового ответа")
+    parser.add_argument('--chunk-chars', type=int, default=20, help="Символов в одном фрагменте потока")
+    parser.add_argument('--chunk-interval', default='fixed:0.05', help="Распределение паузы между фрагментами")
+    parser.add_argument('--seed', type=int, default=None, help="Зерно генератора для воспроизводимых прогонов")
+    return parser.parse_args(argv)
+
+def main(argv=None) -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    args = parse_args(argv)
+    if args.seed is not None:
+        random.seed(args.seed)
+    logger.info(
+        f"Имитация API агента на http://{args.host}:{args.port}{args.path}: задержка {args.latency}, "
+        f"ошибки {args.error_rate:.0%}, зависания {args.hang_rate:.0%}, размер {args.response_size}"
+    )
+    web.run_app(create_app(args), host=args.host, port=args.port, print=None)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import random
+
+# Модуль без зависимостей от остального бота: его использует и локальный сервер
+# utils/mock_ai_server.py, который запускается без конфигурации бота
+
+# Предопределенные ответы на различные типы запросов
+GREETINGS_RESPONSES = [
+    "Здравствуйте! Как я могу вам помочь сегодня?",
+    "Приветствую вас! Расскажите, что вас беспокоит?",
+    "Добрый день! Я готов выслушать вас и помочь. С чего начнем?",
+    "Рад нашей встрече! Что привело вас ко мне?"
+]
+
+EMOTIONAL_RESPONSES = [
+    "Я вижу, что эта ситуация вызывает у вас сильные эмоции. Расскажите подробнее, что именно вас тревожит?",
+    "Ваши чувства совершенно понятны и естественны в такой ситуации. Как давно вы испытываете эти переживания?",
+    "Спасибо, что поделились своими эмоциями. Это важный шаг. Как вы думаете, что могло бы помочь вам почувствовать себя лучше?",
+    "Я понимаю ваши чувства. Давайте подумаем вместе, какие шаги можно предпринять, чтобы облегчить эту эмоциональную нагрузку."
+]
+
+SOLUTION_RESPONSES = [
+    "На основе того, что вы рассказали, я могу предложить несколько стратегий. Во-первых, попробуйте...",
+    "В вашей ситуации может помочь следующий подход: начните с малых шагов...",
+    "Есть несколько проверенных техник, которые могут быть полезны в подобных случаях. Например...",
+    "Я рекомендую обратить внимание на три аспекта: ваши мысли, физическое состояние и социальное окружение. Давайте рассмотрим каждый из них..."
+]
+
+GENERAL_RESPONSES = [
+    "Это интересный вопрос. Давайте разберемся в нем подробнее.",
+    "Понимаю вашу позицию. Хотелось бы узнать больше о контексте этой ситуации.",
+    "Спасибо, что поделились этим. Как вы сами оцениваете эту ситуацию?",
+    "Ваш опыт очень ценен для понимания общей картины. Расскажите, как это влияет на другие сферы вашей жизни?"
+]
+
+# Вопросы для продолжения диалога
+FOLLOW_UP_QUESTIONS = [
+    " Что вы думаете об этом?",
+    " Как это звучит для вас?",
+    " Есть ли какие-то аспекты, которые мы еще не обсудили?",
+    " Как вы себя чувствуете, когда думаете об этом?"
+]
+
+def choose_response(message: str) -> str:
+    """Подобрать ответ по ключевым словам сообщения"""
+    # Определяем тип запроса и выбираем соответствующий ответ
+    message_lower = message.lower()
+    
+    if any(word in message_lower for word in ["привет", "здравствуй", "добрый день", "здраствуй", "хай"]):
+        response = random.choice(GREETINGS_RESPONSES)
+    elif any(word in message_lower for word in ["грустно", "страшно", "боюсь", "тревожно", "злюсь", "обидно"]):
+        response = random.choice(EMOTIONAL_RESPONSES)
+    elif any(word in message_lower for word in ["что делать", "как быть", "помоги", "совет", "решить"]):
+        response = random.choice(SOLUTION_RESPONSES)
+    else:
+        response = random.choice(GENERAL_RESPONSES)
+    
+    # Иногда добавляем вопрос для продолжения диалога
+    if random.random() > 0.5:
+        response += random.choice(FOLLOW_UP_QUESTIONS)
+    
+    return response
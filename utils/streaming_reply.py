@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from telegram import Bot, InlineKeyboardMarkup, Message
+from telegram.error import BadRequest, RetryAfter
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Максимальная длина текста одного сообщения Telegram
+MESSAGE_LIMIT = 4096
+
+# Признак того, что ответ еще печатается
+CURSOR = " ▌"
+
+class StreamingReply:
+    """
+    Постепенный вывод ответа AI агента в Telegram.
+
+    Первое сообщение отправляется сразу после получения первых символов,
+    дальше оно обновляется через edit_message_text не чаще edit_interval секунд
+    и только если накопилось хотя бы min_chars новых символов.
+    При RetryAfter правки откладываются на указанное Telegram время.
+    Текст длиннее MESSAGE_LIMIT продолжается в новом сообщении.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        chat_id: int,
+        edit_interval: float = config.AI_STREAM_EDIT_INTERVAL,
+        min_chars: int = config.AI_STREAM_MIN_CHARS
+    ):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.edit_interval = edit_interval
+        self.min_chars = min_chars
+
+        self.message: Optional[Message] = None
+        # Позиция в полном тексте, с которой начинается текущее сообщение
+        self.offset = 0
+        # Текст, который сейчас показан в текущем сообщении
+        self.shown_text = ''
+        self.next_edit_at = 0.0
+
+    @property
+    def started(self) -> bool:
+        """Отправлено ли пользователю хотя бы одно сообщение"""
+        return self.message is not None
+
+    async def update(self, text: str) -> None:
+        """
+        Показать накопленный текст ответа (вызывается на каждом фрагменте потока).
+        Ошибки Telegram только логируются, чтобы не прерывать чтение ответа агента:
+        окончательный текст все равно будет показан в finish().
+        """
+        try:
+            await self._show_partial(text)
+        except Exception as e:
+            logger.warning(f"Не удалось обновить потоковый ответ в чате {self.chat_id}: {str(e)}")
+
+    async def _show_partial(self, text: str) -> None:
+        await self._flush_full_messages(text)
+        part = text[self.offset:]
+        if not part.strip():
+            return
+
+        if self.message is None:
+            self.message = await self.bot.send_message(chat_id=self.chat_id, text=part + CURSOR)
+            self.shown_text = part
+            self.next_edit_at = time.monotonic() + self.edit_interval
+            return
+
+        if time.monotonic() < self.next_edit_at or len(part) - len(self.shown_text) < self.min_chars:
+            return
+        await self._edit(part + CURSOR)
+        self.shown_text = part
+
+    async def finish(self, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None) -> None:
+        """Показать окончательный текст ответа с клавиатурой"""
+        await self._flush_full_messages(text)
+        part = text[self.offset:]
+
+        if self.message is None:
+            self.message = await self.bot.send_message(chat_id=self.chat_id, text=part, reply_markup=reply_markup)
+            return
+
+        # Последняя правка должна дойти обязательно, поэтому ждем окончания ограничения
+        try:
+            await self._edit(part, reply_markup, wait=True)
+        except RetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+            await self._edit(part, reply_markup, wait=True)
+
+    async def _flush_full_messages(self, text: str) -> None:
+        """Зафиксировать заполненные сообщения и перейти к новому"""
+        while len(text) - self.offset > MESSAGE_LIMIT:
+            chunk = text[self.offset:self.offset + MESSAGE_LIMIT]
+            if self.message is None:
+                await self.bot.send_message(chat_id=self.chat_id, text=chunk)
+            else:
+                await self._edit(chunk, wait=True)
+            self.offset += MESSAGE_LIMIT
+            self.message = None
+            self.shown_text = ''
+
+    async def _edit(self, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None, wait: bool = False) -> None:
+        """
+        Изменить текущее сообщение.
+
+        Args:
+            wait: Дождаться окончания интервала между правками и не глотать RetryAfter
+        """
+        if wait:
+            delay = self.next_edit_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        try:
+            await self.message.edit_text(text=text, reply_markup=reply_markup)
+        except RetryAfter as e:
+            self.next_edit_at = time.monotonic() + e.retry_after
+            logger.warning(f"Telegram ограничил правки в чате {self.chat_id} на {e.retry_after} с")
+            if wait:
+                raise
+            return
+        except BadRequest as e:
+            # Текст мог не измениться с прошлой правки
+            if 'not modified' not in str(e).lower():
+                raise
+        self.next_edit_at = time.monotonic() + self.edit_interval